@@ -0,0 +1,247 @@
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from landmark_cache import LandmarkCache, cache_key
+from landmarks import empty_landmarks, landmarks_to_array
+from motion import MotionDetector
+from moves import DANCES, MOVES, moves_for_dances, score_batch
+from pose_provider import pose_solution
+from smoothing import SMOOTHERS, make_smoother, smooth_sequence
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+
+# Per-worker state set by the pool initializer. The Pose instance is built on
+# the first cache miss, so re-scoring a fully cached library never loads it.
+worker_pose = None
+worker_settings = {}
+worker_cache = None
+
+def init_worker(pose_settings, cache_dir=None):
+    global worker_settings, worker_cache
+    worker_settings = pose_settings
+    worker_cache = LandmarkCache(cache_dir) if cache_dir else None
+
+def get_worker_pose():
+    global worker_pose
+    if worker_pose is None:
+        worker_pose = pose_solution().Pose(**worker_settings)
+    return worker_pose
+
+def find_videos(directory):
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+def extract_video(path, pose):
+    # Decode a whole video: (frames, 33, 4) landmarks (NaN when no pose) and
+    # motion flags. Raises OSError when the file cannot be opened.
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        cap.release()
+        raise OSError(f"Could not open video {path!r}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    pose.reset()
+    motion_detector = MotionDetector()
+    frames = []
+    motion_flags = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        landmarks = empty_landmarks()
+        if results.pose_landmarks:
+            landmarks_to_array(results.pose_landmarks.landmark, out=landmarks)
+        frames.append(landmarks)
+        motion_flags.append(motion_detector.detect(frame))
+    cap.release()
+    landmarks = np.stack(frames) if frames else empty_landmarks(0)
+    return landmarks, np.array(motion_flags, dtype=bool), fps
+
+def score_landmarks(landmarks, motion_flags, move_names):
+    detected = ~np.isnan(landmarks[:, 0, 0])
+    scores = score_batch(landmarks, move_names)
+    return {"detected": detected, "motion": motion_flags, "scores": scores}
+
+def load_video(path):
+    # Landmarks for a video, from the cache when the same file and settings were seen before
+    if worker_cache is None:
+        return extract_video(path, get_worker_pose())
+    key = cache_key(path, worker_settings)
+    cached = worker_cache.load(key)
+    if cached is not None:
+        return cached
+    landmarks, motion_flags, fps = extract_video(path, get_worker_pose())
+    # A video that decoded no frames is not worth remembering
+    if len(landmarks):
+        worker_cache.store(key, landmarks, motion_flags, fps, source=os.path.basename(path))
+    return landmarks, motion_flags, fps
+
+def score_video(path, move_names, smoothing="off"):
+    landmarks, motion_flags, fps = load_video(path)
+    # Cached landmarks stay raw; smoothing is cheap and applied per run
+    smoother = make_smoother(smoothing)
+    if smoother is not None:
+        landmarks = smooth_sequence(smoother, landmarks, fps)
+    result = score_landmarks(landmarks, motion_flags, move_names)
+    result.update(video=path, fps=fps)
+    return result
+
+def frame_rows(result, move_names):
+    video = os.path.basename(result["video"])
+    fps = result["fps"]
+    for index, detected in enumerate(result["detected"]):
+        row = {
+            "video": video,
+            "frame": index,
+            "time": index / fps if fps else None,
+            "detected": int(detected),
+            "motion": int(result["motion"][index]),
+        }
+        for name in move_names:
+            row[name] = int(result["scores"][name][index]) if detected else None
+        yield row
+
+def video_row(result, move_names):
+    detected = result["detected"]
+    detected_frames = int(detected.sum())
+    row = {
+        "video": os.path.basename(result["video"]),
+        "frames": len(detected),
+        "detected_frames": detected_frames,
+        "motion_frames": int(result["motion"].sum()),
+    }
+    # Hit rate of each move over the frames where a pose was found
+    for name in move_names:
+        hits = int(result["scores"][name][detected].sum())
+        row[name] = hits / detected_frames if detected_frames else 0.0
+    row["overall_score"] = (
+        sum(row[name] for name in move_names) / len(move_names) * 100 if move_names else 0.0
+    )
+    row["error"] = None
+    return row
+
+def error_row(path, error):
+    # A video that could not be scored; its score columns stay empty
+    return {"video": os.path.basename(path), "error": str(error)}
+
+def write_table(rows, path, fmt):
+    rows = list(rows)
+    if fmt == "parquet":
+        try:
+            import pandas as pd
+        except ImportError:
+            raise SystemExit("Parquet output needs pandas and pyarrow installed.")
+        pd.DataFrame(rows).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="") as f:
+        if not rows:
+            return
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+class CsvAppender:
+    # CSV file written a batch of rows at a time and flushed after each, so a
+    # long run keeps everything scored so far if it dies
+    def __init__(self, path, fieldnames):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def score_directory(directory, out_dir, move_names, workers=None, fmt="csv", pose_settings=None,
+                    cache_dir=None, smoothing="off"):
+    # Per-frame rows are written as each video finishes, never held for the
+    # whole library: appended to frames.csv, or one Parquet file per video in
+    # frames/ (pandas reads the folder as one table). A video that fails gets
+    # a row with its error in the videos table and the run goes on.
+    videos = find_videos(directory)
+    os.makedirs(out_dir, exist_ok=True)
+    videos_table = []
+    frames_out = videos_out = None
+    if fmt == "csv":
+        frame_fields = ["video", "frame", "time", "detected", "motion"] + list(move_names)
+        video_fields = (["video", "frames", "detected_frames", "motion_frames"] + list(move_names)
+                        + ["overall_score", "error"])
+        frames_out = CsvAppender(os.path.join(out_dir, "frames.csv"), frame_fields)
+        videos_out = CsvAppender(os.path.join(out_dir, "videos.csv"), video_fields)
+    else:
+        os.makedirs(os.path.join(out_dir, "frames"), exist_ok=True)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=init_worker,
+            initargs=(pose_settings or {}, cache_dir),
+        ) as executor:
+            futures = {executor.submit(score_video, path, move_names, smoothing): path for path in videos}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    row = error_row(futures[future], e)
+                    videos_table.append(row)
+                    if fmt == "csv":
+                        videos_out.write([row])
+                    print(f"Failed {futures[future]}: {e}")
+                    continue
+                row = video_row(result, move_names)
+                videos_table.append(row)
+                if fmt == "csv":
+                    frames_out.write(frame_rows(result, move_names))
+                    videos_out.write([row])
+                else:
+                    path = os.path.join(out_dir, "frames", os.path.basename(result["video"]) + ".parquet")
+                    write_table(frame_rows(result, move_names), path, fmt)
+                print(f"Scored {result['video']} ({len(result['detected'])} frames)")
+    finally:
+        if fmt == "csv":
+            frames_out.close()
+            videos_out.close()
+    if fmt != "csv":
+        write_table(videos_table, os.path.join(out_dir, f"videos.{fmt}"), fmt)
+    return videos_table
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a directory of recorded dance videos.")
+    parser.add_argument("directory", help="Directory containing the video files")
+    parser.add_argument("--out", default="scores", help="Output directory for the score tables")
+    parser.add_argument("--dance", action="append", choices=sorted(DANCES),
+                        help="Dance to score (repeatable, default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--cache-dir", default=None,
+                        help="Reuse landmarks stored here instead of re-running pose inference")
+    parser.add_argument("--smoothing", choices=SMOOTHERS, default="off", help="Landmark filter applied before scoring")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    move_names = moves_for_dances(args.dance) if args.dance else list(MOVES)
+    score_directory(
+        args.directory,
+        args.out,
+        move_names,
+        workers=args.workers,
+        fmt=args.format,
+        pose_settings={"model_complexity": args.model_complexity},
+        cache_dir=args.cache_dir,
+        smoothing=args.smoothing,
+    )
+
+if __name__ == "__main__":
+    main()
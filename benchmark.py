@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import platform
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from engine import MoveScorer, draw_landmarks
+from landmarks import NUM_LANDMARKS, landmarks_to_array
+from motion import MotionDetector
+from moves import MOVES
+from pose_provider import TIERS, provider
+from preview import PreviewEncoder
+from report import ReportModel
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "first.jpg")
+DEFAULT_RESOLUTIONS = ("640x480", "1280x720", "1920x1080")
+# The per-frame stages of the app's session loop, in the order it runs them
+STAGES = ("detect_motion", "cvtColor", "pose_process", "analyze", "draw_landmarks", "preview_encode", "report")
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def load_frames(size, count, video=None):
+    # Frames from a recorded video, or shifted copies of the bundled sample image
+    # so that motion detection sees real differences between frames
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.resize(frame, size))
+        cap.release()
+    if not frames:
+        image = cv2.resize(cv2.imread(SAMPLE_IMAGE), size)
+        step = max(1, size[0] // 100)
+        frames = [np.roll(image, index * step, axis=1) for index in range(count)]
+    return frames
+
+def synthetic_landmarks(seed=0):
+    # Stand-in pose used for the analysis stages when no person is detected
+    rng = np.random.default_rng(seed)
+    landmarks = rng.uniform(0.2, 0.8, size=(NUM_LANDMARKS, 4)).astype(np.float32)
+    landmarks[:, 3] = 1.0
+    return landmarks
+
+def summarize(samples):
+    samples_ms = np.array(samples) * 1000
+    mean = float(samples_ms.mean())
+    return {
+        "count": len(samples_ms),
+        "mean_ms": mean,
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "throughput_fps": 1000 / mean if mean else 0.0,
+    }
+
+def run_resolution(frames, pose, move_names, warmup=5, preview_width=640):
+    scorer = MoveScorer(move_names)
+    detector = MotionDetector()
+    preview = PreviewEncoder(max_width=preview_width)
+    report = ReportModel(scorer.move_names)
+    fallback = synthetic_landmarks()
+    samples = {stage: [] for stage in STAGES + ("total",)}
+    detected = 0
+
+    for index, frame in enumerate(frames):
+        frame = frame.copy()
+        timings = {}
+
+        started = time.perf_counter()
+        moving = detector.detect(frame)
+        timings["detect_motion"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        timings["cvtColor"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = pose.process(frame_rgb)
+        timings["pose_process"] = time.perf_counter() - started
+
+        if results.pose_landmarks:
+            detected += 1
+            landmarks = landmarks_to_array(results.pose_landmarks.landmark)
+        else:
+            landmarks = fallback
+
+        started = time.perf_counter()
+        scorer.update(landmarks)
+        timings["analyze"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        draw_landmarks(frame, landmarks)
+        timings["draw_landmarks"] = time.perf_counter() - started
+
+        # Every frame is encoded and rendered here, which the app rate-limits
+        started = time.perf_counter()
+        preview.encode(frame)
+        timings["preview_encode"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        report.update(
+            scorer.scores, scorer.feedback,
+            "Motion detected! Keep moving." if moving else "No significant motion detected.",
+        )
+        report.poll(force=True)
+        timings["report"] = time.perf_counter() - started
+
+        if index < warmup:
+            continue
+        for stage, seconds in timings.items():
+            samples[stage].append(seconds)
+        samples["total"].append(sum(timings.values()))
+
+    stages = {stage: summarize(values) for stage, values in samples.items() if values}
+    return {"stages": stages, "frames": len(frames) - warmup, "detected_frames": detected}
+
+def run_benchmark(resolutions, count=60, video=None, tier="full", move_names=None, warmup=5, preview_width=640):
+    move_names = list(MOVES) if move_names is None else move_names
+    # The same warmed, shared Pose the app gets for this tier
+    pose = provider.acquire(tier)
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "mediapipe": getattr(mp, "__version__", "unknown"),
+        "input": video or os.path.basename(SAMPLE_IMAGE),
+        "tier": tier,
+        "preview_width": preview_width,
+        "moves": move_names,
+        "resolutions": {},
+    }
+    for resolution in resolutions:
+        frames = load_frames(parse_resolution(resolution), count + warmup, video)
+        pose.reset()
+        results["resolutions"][resolution] = run_resolution(frames, pose, move_names, warmup, preview_width)
+    provider.release(pose)
+    return results
+
+def compare(results, baseline, tolerance=0.2, metric="p95_ms"):
+    # Stages whose latency grew by more than `tolerance` against a saved run
+    regressions = []
+    for resolution, current in results["resolutions"].items():
+        previous = baseline.get("resolutions", {}).get(resolution)
+        if not previous:
+            continue
+        for stage, summary in current["stages"].items():
+            before = previous["stages"].get(stage, {}).get(metric)
+            if before and summary[metric] > before * (1 + tolerance):
+                regressions.append((resolution, stage, before, summary[metric]))
+    return regressions
+
+def print_results(results):
+    for resolution, result in results["resolutions"].items():
+        print(f"{resolution} ({result['frames']} frames, pose found in {result['detected_frames']})")
+        print(f"  {'stage':<16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'fps':>10}")
+        for stage, summary in result["stages"].items():
+            print(f"  {stage:<16}{summary['p50_ms']:>9.2f}{summary['p95_ms']:>9.2f}"
+                  f"{summary['p99_ms']:>9.2f}{summary['throughput_fps']:>10.1f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dance scoring pipeline stages.")
+    parser.add_argument("--video", default=None, help="Recorded video to use instead of first.jpg")
+    parser.add_argument("--frames", type=int, default=60, help="Timed frames per resolution")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed frames per resolution")
+    parser.add_argument("--resolutions", default=",".join(DEFAULT_RESOLUTIONS),
+                        help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--tier", choices=tuple(TIERS), default="full", help="Pose model tier")
+    parser.add_argument("--preview-width", type=int, default=640, help="Width of the encoded preview JPEG")
+    parser.add_argument("--out", default=None, help="Write the results as JSON here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed p95 slowdown against the baseline (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmark(
+        args.resolutions.split(","),
+        count=args.frames,
+        video=args.video,
+        tier=args.tier,
+        warmup=args.warmup,
+        preview_width=args.preview_width,
+    )
+    print_results(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for resolution, stage, before, after in regressions:
+            print(f"REGRESSION {resolution} {stage}: p95 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import math
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import batch_score
+from landmark_cache import cache_key
+from landmarks import (
+    LEFT_ANKLE, LEFT_ELBOW, LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, LEFT_WRIST, NUM_LANDMARKS, RIGHT_ANKLE,
+    RIGHT_ELBOW, RIGHT_HIP, RIGHT_KNEE, RIGHT_SHOULDER, RIGHT_WRIST, VISIBILITY, X, Y,
+)
+from recorder import SessionReader
+
+# Scoring against a recorded reference performance instead of fixed rules.
+# Poses are normalized for position and body size (hip midpoint at the origin,
+# torso length 1), so distances are in torso lengths, and sequences are aligned
+# with dynamic time warping so a dancer may be faster or slower than the
+# reference in places.
+
+BODY_JOINTS = [
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+    LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE,
+]
+# Body parts as positions in BODY_JOINTS, for per-part feedback
+BODY_PARTS = {
+    "left_arm": (0, 2, 4),
+    "right_arm": (1, 3, 5),
+    "left_leg": (6, 8, 10),
+    "right_leg": (7, 9, 11),
+}
+PART_LABELS = {
+    "left_arm": "left arm",
+    "right_arm": "right arm",
+    "left_leg": "left leg",
+    "right_leg": "right leg",
+}
+REFERENCE_EXTENSIONS = (".fdlog", ".npy") + batch_score.VIDEO_EXTENSIONS
+
+Alignment = namedtuple("Alignment", "distance similarity path part_errors")
+
+def normalize_poses(landmarks, min_visibility=0.5):
+    # (..., 33, 4) -> (..., 12, 2) body joints relative to the hip midpoint in
+    # torso lengths; joints below min_visibility and frames without a pose are NaN
+    points = landmarks[..., BODY_JOINTS, :][..., [X, Y]].astype(np.float32)
+    hips = (landmarks[..., LEFT_HIP, [X, Y]] + landmarks[..., RIGHT_HIP, [X, Y]]) / 2
+    shoulders = (landmarks[..., LEFT_SHOULDER, [X, Y]] + landmarks[..., RIGHT_SHOULDER, [X, Y]]) / 2
+    torso = np.linalg.norm(shoulders - hips, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        points = (points - hips[..., None, :]) / torso[..., None, None]
+    hidden = landmarks[..., BODY_JOINTS, VISIBILITY] < min_visibility
+    points[hidden] = np.nan
+    # A collapsed torso (side view, bad detection) gives no usable scale
+    points[~(torso > 1e-3)] = np.nan
+    return points
+
+def frame_costs(poses, pose, miss_cost=1.0):
+    # Mean joint distance between one normalized pose and each of `poses`,
+    # over the joints visible in both; miss_cost when none are
+    distances = np.sqrt(np.square(poses - pose).sum(axis=-1))
+    visible = ~np.isnan(distances)
+    count = visible.sum(axis=-1)
+    total = np.where(visible, distances, 0.0).sum(axis=-1)
+    return np.where(count > 0, total / np.maximum(count, 1), miss_cost)
+
+def similarity(distance, tolerance=0.25):
+    # 100 for identical poses, about 37 at `tolerance` torso lengths apart
+    return 100.0 * math.exp(-distance / tolerance)
+
+def band_limits(rows, columns, band):
+    # Sakoe-Chiba band along the diagonal scaled to both lengths. The half
+    # width is at least the slope, so consecutive rows' windows always touch.
+    slope = (columns - 1) / (rows - 1) if rows > 1 else float(columns)
+    width = max(band * columns, slope, 1.0)
+    centers = np.arange(rows) * slope
+    lo = np.clip(np.floor(centers - width), 0, columns - 1).astype(int)
+    hi = np.clip(np.ceil(centers + width) + 1, 1, columns).astype(int)
+    hi[-1] = columns
+    return lo, hi
+
+def dtw_row(costs, previous):
+    # One DTW row: D[j] = costs[j] + min(prev[j - 1], prev[j], D[j - 1]).
+    # The left dependency unrolls to a running minimum over cumulative costs,
+    # so the row needs no Python loop.
+    cumulative = np.cumsum(costs)
+    return cumulative + np.minimum.accumulate(previous - (cumulative - costs))
+
+def align(query, reference, band=0.1, tolerance=0.25, miss_cost=1.0):
+    # Banded DTW of two normalized pose sequences (N, 12, 2) and (M, 12, 2).
+    # Time and memory are O(N * band * M) instead of O(N * M).
+    rows, columns = len(query), len(reference)
+    if not rows or not columns:
+        return Alignment(float("inf"), 0.0, [], {part: float("nan") for part in BODY_PARTS})
+    lo, hi = band_limits(rows, columns, band)
+    # Previous row on a padded full-width scratch line: index j + 1 is column j
+    line = np.full(columns + 1, np.inf)
+    line[0] = 0.0
+    matrix = []
+    for row in range(rows):
+        start, stop = lo[row], hi[row]
+        previous = np.minimum(line[start:stop], line[start + 1:stop + 1])
+        current = dtw_row(frame_costs(reference[start:stop], query[row], miss_cost), previous)
+        matrix.append(current)
+        line[:] = np.inf
+        line[start + 1:stop + 1] = current
+    path = backtrack(matrix, lo, hi)
+    distance = float(matrix[-1][-1]) / len(path)
+    return Alignment(distance, similarity(distance, tolerance), path, part_errors(query, reference, path))
+
+def backtrack(matrix, lo, hi):
+    # Cheapest (query frame, reference frame) path from the end back to (0, 0)
+    def cell(row, column):
+        if row < 0 or column < lo[row] or column >= hi[row]:
+            return np.inf
+        return matrix[row][column - lo[row]]
+
+    row, column = len(matrix) - 1, hi[-1] - 1
+    path = [(row, column)]
+    while row or column:
+        steps = ((row - 1, column - 1), (row - 1, column), (row, column - 1))
+        row, column = min(steps, key=lambda step: cell(*step))
+        path.append((row, column))
+    path.reverse()
+    return path
+
+def part_errors(query, reference, path):
+    # Mean distance of each body part's joints over the aligned frame pairs
+    pairs = np.array(path)
+    distances = np.sqrt(np.square(query[pairs[:, 0]] - reference[pairs[:, 1]]).sum(axis=-1))
+    errors = {}
+    with np.errstate(invalid="ignore"):
+        for part, joints in BODY_PARTS.items():
+            values = distances[:, joints]
+            values = values[~np.isnan(values)]
+            errors[part] = float(values.mean()) if len(values) else float("nan")
+    return errors
+
+def part_feedback(errors, tolerance=0.25):
+    # One line naming the body part furthest from the reference
+    known = {part: error for part, error in errors.items() if not math.isnan(error)}
+    if not known:
+        return "Could not see enough of the body to compare."
+    part = max(known, key=known.get)
+    if known[part] < tolerance / 2:
+        return "Close to the reference throughout. Great job!"
+    return f"Your {PART_LABELS[part]} differs most from the reference; watch it closely."
+
+class StreamingAligner:
+    # Live alignment to a reference, one frame at a time. Only a window of
+    # `band` reference frames either side of the current position is updated,
+    # so each frame costs O(band) whatever the reference length. The dancer may
+    # start up to `band` frames into the reference; with loop=True the
+    # alignment restarts after the reference's last frame, for repeated moves.
+    def __init__(self, reference, band=30, tolerance=0.25, smoothing=0.2, loop=True, miss_cost=1.0):
+        self.reference = reference
+        self.band = band
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.loop = loop
+        self.miss_cost = miss_cost
+        self.column = np.full(len(reference), np.inf)
+        self.window = None
+        self.position = 0
+        self.distance = None
+        self.passes = 0
+
+    def reset(self):
+        self.column[:] = np.inf
+        self.window = None
+        self.position = 0
+        self.distance = None
+
+    def update(self, landmarks):
+        # Returns the smoothed similarity (0-100), or None without a pose
+        if landmarks is None or not len(self.reference):
+            return None
+        pose = normalize_poses(landmarks)
+        if np.isnan(pose).all():
+            return None
+        if self.window is None:
+            start, stop = 0, min(len(self.reference), self.band + 1)
+            previous = np.zeros(stop - start)
+        else:
+            start = max(0, self.position - self.band)
+            stop = min(len(self.reference), self.position + self.band + 1)
+            line = self.column[max(0, start - 1):stop]
+            if start == 0:
+                line = np.concatenate(([np.inf], line))
+            previous = np.minimum(line[:-1], line[1:])
+        costs = frame_costs(self.reference[start:stop], pose, self.miss_cost)
+        current = dtw_row(costs, previous)
+        if self.window is not None:
+            self.column[self.window[0]:self.window[1]] = np.inf
+        self.column[start:stop] = current
+        self.window = (start, stop)
+        self.position = start + int(np.argmin(current))
+        cost = float(costs[self.position - start])
+        if self.distance is None:
+            self.distance = cost
+        else:
+            self.distance += self.smoothing * (cost - self.distance)
+        if self.loop and self.position == len(self.reference) - 1:
+            self.passes += 1
+            distance = self.distance
+            self.reset()
+            self.distance = distance
+        return similarity(self.distance, self.tolerance)
+
+    def progress(self):
+        # Fraction of the reference the dancer has reached
+        return self.position / max(len(self.reference) - 1, 1)
+
+def load_sequence(path, pose=None, cache=None, pose_settings=None):
+    # (N, 33, 4) landmarks of a session log, an .npy array or a video; frames
+    # without a pose are dropped. Videos go through batch_score's Pose and
+    # landmark cache, or `pose` when given (with `cache`, a LandmarkCache
+    # keyed by pose_settings, when given too). Raises ValueError for an array
+    # that is not landmarks.
+    if not os.path.exists(path):
+        raise OSError(f"No such file {path!r}")
+    if path.endswith(".fdlog"):
+        landmarks = SessionReader(path).landmarks()
+    elif path.endswith(".npy"):
+        landmarks = np.load(path)
+    elif pose is not None and cache is not None:
+        key = cache_key(path, pose_settings)
+        extracted = cache.load(key)
+        if extracted is None:
+            extracted = batch_score.extract_video(path, pose)
+            if len(extracted[0]):
+                cache.store(key, *extracted, source=os.path.basename(path))
+        landmarks = extracted[0]
+    elif pose is not None:
+        landmarks = batch_score.extract_video(path, pose)[0]
+    else:
+        landmarks = batch_score.load_video(path)[0]
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    if landmarks.ndim != 3 or landmarks.shape[1:] != (NUM_LANDMARKS, 4):
+        raise ValueError(f"{path!r} holds an array of shape {landmarks.shape}, expected (frames, {NUM_LANDMARKS}, 4)")
+    return landmarks[~np.isnan(landmarks[:, 0, 0])]
+
+def find_attempts(paths):
+    attempts = []
+    for path in paths:
+        if os.path.isdir(path):
+            attempts.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(REFERENCE_EXTENSIONS)
+            ))
+        else:
+            attempts.append(path)
+    return attempts
+
+# Per-worker reference, normalized once by the pool initializer
+worker_reference = None
+worker_options = {}
+
+def init_worker(reference, options, pose_settings, cache_dir=None):
+    global worker_reference, worker_options
+    worker_reference = reference
+    worker_options = options
+    batch_score.init_worker(pose_settings, cache_dir)
+
+def compare_attempt(path):
+    query = normalize_poses(load_sequence(path))
+    alignment = align(query, worker_reference, **worker_options)
+    row = {
+        "attempt": os.path.basename(path),
+        "frames": len(query),
+        "distance": alignment.distance,
+        "similarity": alignment.similarity,
+    }
+    row.update(alignment.part_errors)
+    row["feedback"] = part_feedback(alignment.part_errors, worker_options["tolerance"])
+    return row
+
+def compare_attempts(reference_path, attempt_paths, band=0.1, tolerance=0.25, workers=None, pose_settings=None,
+                     cache_dir=None):
+    # Align every attempt to one reference on a process pool. The reference is
+    # extracted and normalized once and shipped to each worker at start-up.
+    # Workers are spawned, not forked: a reference video leaves a MediaPipe
+    # graph running in this process, which forked children would deadlock on.
+    pose_settings = pose_settings or {}
+    batch_score.init_worker(pose_settings, cache_dir)
+    reference = normalize_poses(load_sequence(reference_path))
+    options = {"band": band, "tolerance": tolerance}
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(reference, options, pose_settings, cache_dir),
+    ) as executor:
+        return list(executor.map(compare_attempt, attempt_paths))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score dance attempts against a reference performance.")
+    parser.add_argument("reference", help="Reference video, session log (.fdlog) or landmark array (.npy)")
+    parser.add_argument("attempts", nargs="+", help="Attempt files or directories of them")
+    parser.add_argument("--out", default="alignments.csv", help="Output table (.csv or .parquet)")
+    parser.add_argument("--band", type=float, default=0.1,
+                        help="DTW band half-width as a fraction of the reference length")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Distance in torso lengths that scores about 37%%")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--cache-dir", default=None, help="Landmark cache shared with batch_score.py")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = compare_attempts(
+        args.reference,
+        find_attempts(args.attempts),
+        band=args.band,
+        tolerance=args.tolerance,
+        workers=args.workers,
+        pose_settings={"model_complexity": args.model_complexity},
+        cache_dir=args.cache_dir,
+    )
+    batch_score.write_table(rows, args.out, "parquet" if args.out.endswith(".parquet") else "csv")
+    for row in rows:
+        print(f"{row['attempt']}: {row['similarity']:.0f}% ({row['frames']} frames) - {row['feedback']}")
+
+if __name__ == "__main__":
+    main()
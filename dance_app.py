@@ -0,0 +1,302 @@
+import os
+import time
+
+import streamlit as st
+
+from pose_provider import TIERS, provider
+from profiling import FrameProfiler, StageProfiler, serve_metrics
+from scheduler import MODES, InferenceScheduler
+from session_control import SessionController
+from smoothing import SMOOTHERS, make_smoother
+import startup
+
+# Process-wide metrics: this module is imported once per Streamlit server, so
+# these survive reruns and aggregate every session for the metrics endpoint and
+# JSON log. Each session's live panel reads its own profiler, which forwards here.
+profiler = StageProfiler()
+metrics_servers = {}
+
+# How often the live panel and the JSON log are refreshed
+PANEL_INTERVAL = 0.5
+JSON_LOG_INTERVAL = 5.0
+
+def load_model(tier_choice, budget_ms, pose_options):
+    # Background start-up work: pick the tier and build a warmed Pose for it
+    tier = provider.select_tier(budget_ms) if tier_choice == "auto" else tier_choice
+    provider.prewarm(tier, **pose_options)
+    return tier
+
+def load_reference(path, tier, pose_options, cache_dir):
+    # Background reference loading; a video reference goes through the
+    # landmark cache, so it is only decoded the first time
+    from choreography import load_sequence
+    from landmark_cache import LandmarkCache
+    from pose_provider import pose_settings
+
+    if path.endswith((".fdlog", ".npy")):
+        return load_sequence(path)
+    pose = provider.acquire(tier, **pose_options)
+    try:
+        return load_sequence(
+            path, pose=pose, cache=LandmarkCache(cache_dir) if cache_dir else None,
+            pose_settings=pose_settings(tier, **pose_options),
+        )
+    finally:
+        provider.release(pose)
+
+def run_app(title, intro, move_names):
+    # cv2, mediapipe and the session modules load in a background thread
+    # while the page renders; they are only needed once a session starts
+    modules = startup.preload_modules()
+    st.title(title)
+    st.write(intro)
+
+    inference_mode = st.selectbox("Pose inference", MODES)
+
+    with st.sidebar:
+        st.subheader("Input")
+        video_source = st.text_input("Video source (camera index, file, image folder or stream URL)", "0")
+        st.subheader("Pose model")
+        tier_choice = st.selectbox("Model tier", ("auto",) + tuple(TIERS), index=2)
+        budget_ms = st.slider("Latency budget for auto (ms)", 5, 200, 33)
+        detection_confidence = st.slider("Min detection confidence", 0.0, 1.0, 0.5)
+        tracking_confidence = st.slider("Min tracking confidence", 0.0, 1.0, 0.5)
+        smoothing = st.selectbox("Landmark smoothing", SMOOTHERS, index=SMOOTHERS.index("one_euro"))
+        crop_to_dancer = st.checkbox("Crop to the dancer", value=True)
+        crop_size = st.slider("Crop size (px)", 256, 1280, 640, step=64)
+        st.subheader("Performance")
+        pose_workers = st.number_input("Pose worker processes (0 = a thread in this process)", 0, 16, 0)
+        profile_frames = st.number_input("cProfile the next N frames", 0, 10000, 0)
+        metrics_port = st.number_input("Metrics port (0 = off)", 0, 65535, 0)
+        json_log = st.text_input("Metrics JSON log file", "")
+        st.subheader("Preview")
+        preview_width = st.slider("Preview width (px)", 160, 1920, 640, step=80)
+        preview_fps = st.slider("Preview frame rate", 1, 30, 10)
+        st.subheader("Recording")
+        session_log = st.text_input("Record session to (.fdlog)", "")
+        compress_log = st.checkbox("Compress session log", value=False)
+        st.subheader("Reference")
+        reference_path = st.text_input("Reference performance (video, .fdlog or .npy)", "")
+        reference_band = st.slider("Alignment window (frames)", 5, 120, 30)
+        reference_cache = st.text_input("Reference landmark cache folder (empty = off)", ".landmark_cache")
+        st.subheader("Session")
+        idle_timeout = st.number_input("Stop after this many seconds without a dancer (0 = never)", 0, 3600, 60)
+    if metrics_port and metrics_port not in metrics_servers:
+        metrics_servers[metrics_port] = serve_metrics(profiler, int(metrics_port))
+
+    # Tier measurements and warmed models are built once per process and
+    # settings, in the background, so page loads never wait for them
+    pose_options = {
+        "min_detection_confidence": detection_confidence,
+        "min_tracking_confidence": tracking_confidence,
+    }
+    model = startup.run_once(
+        ("model", tier_choice, budget_ms if tier_choice == "auto" else None, tuple(sorted(pose_options.items()))),
+        lambda: load_model(tier_choice, budget_ms, pose_options),
+    )
+    if not model.done():
+        st.caption("Pose model: loading in the background...")
+    elif model.error is not None:
+        st.error(f"Could not load the pose model: {model.error}")
+    else:
+        st.caption(f"Pose model: {model.value}")
+    with st.sidebar.expander("Startup times"):
+        st.text(startup.report.render())
+
+    # The running session lives in session_state, so the Stop button's
+    # callback reaches it from the rerun its click triggers
+    controller = st.session_state.setdefault("session_controller", SessionController())
+    start_button = st.button("Start Dance")
+    stop_button = st.button("Stop Dance", on_click=controller.stop, args=("Stopped by user",))
+
+    # Create a placeholder for video and feedback
+    video_placeholder = st.empty()
+    report_column, panel_column = st.columns([3, 1])
+    report_placeholder = report_column.empty()
+    stats_placeholder = panel_column.empty()
+    startup.record_first_render()
+
+    if start_button:
+        with st.spinner("Loading the pose model..."):
+            try:
+                modules.result()
+                tier = model.result()
+            except Exception as e:
+                st.error(f"Start-up failed: {e}")
+                return
+        # Already imported by the preloader, so these are dictionary lookups
+        import cv2
+        from choreography import StreamingAligner, normalize_poses
+        from engine import DanceEngine, MoveScorer, draw_landmarks
+        from frame_ring import RingPipeline
+        from pipeline import FramePipeline
+        from preview import PreviewEncoder
+        from recorder import SessionRecorder
+        from report import ReportModel
+        from roi import RoiTracker
+        from sources import open_capture
+
+        # Everything the session opens is registered with it and released in
+        # reverse order when the with block exits, including when Streamlit
+        # interrupts this run because the user clicked Stop or left the page
+        with controller.start(idle_timeout) as session:
+            try:
+                cap = session.add(open_capture(video_source))
+            except OSError as e:
+                st.error(str(e))
+                return
+            aligner = None
+            if reference_path:
+                # Loaded once per file version and settings, off the script
+                # thread; the wait below keeps reaching st.* calls, so Stop
+                # still interrupts it
+                modified = os.path.getmtime(reference_path) if os.path.exists(reference_path) else None
+                task = startup.run_once(
+                    ("reference", reference_path, modified, tier, tuple(sorted(pose_options.items())),
+                     reference_cache),
+                    lambda: load_reference(reference_path, tier, pose_options, reference_cache),
+                )
+                status = st.empty()
+                while not task.done():
+                    status.caption("Loading the reference...")
+                    time.sleep(0.2)
+                status.empty()
+                try:
+                    reference = task.result()
+                except (OSError, ValueError) as e:
+                    st.error(f"Could not load the reference: {e}")
+                    return
+                if not len(reference):
+                    st.error("No pose was found in the reference.")
+                    return
+                aligner = StreamingAligner(normalize_poses(reference), band=reference_band)
+            reference_match = None
+            session_profiler = StageProfiler(parent=profiler)
+            engine = None
+            if pose_workers:
+                # Inference runs in the worker processes; this process only
+                # scores and draws, so it needs no Pose of its own
+                scorer = MoveScorer(move_names)
+            else:
+                pose = provider.acquire(tier, **pose_options)
+                session.add(pose, lambda: provider.release(pose))
+                engine = DanceEngine(
+                    move_names, pose=pose, scheduler=InferenceScheduler(inference_mode), profiler=session_profiler,
+                    roi_tracker=RoiTracker(max_side=crop_size) if crop_to_dancer else None,
+                    smoother=make_smoother(smoothing),
+                )
+                scorer = engine.scorer
+            frame_profiler = None
+            if profile_frames:
+                frame_profiler = session.add(FrameProfiler(int(profile_frames)))
+            recorder = None
+            if session_log:
+                recorder = session.add(SessionRecorder(
+                    session_log, scorer.move_names, fps=cap.get(cv2.CAP_PROP_FPS) or None, compress=compress_log
+                ).start())
+            # Registered last, so its threads stop before the Pose and the
+            # capture they use are released
+            if pose_workers:
+                # Inference in worker processes fed through shared memory
+                pipeline = RingPipeline(
+                    cap, int(pose_workers), tier, profiler=session_profiler, pose_options=pose_options,
+                    inference_mode=inference_mode, crop_size=crop_size if crop_to_dancer else None,
+                    smoothing=smoothing, frame_profiler=frame_profiler,
+                )
+                session.add(pipeline, pipeline.stop)
+                pipeline.start()
+            else:
+                pipeline = FramePipeline(
+                    cap, engine.process_frame, profiler=session_profiler, frame_profiler=frame_profiler
+                ).start()
+                session.add(pipeline, pipeline.stop)
+            preview = PreviewEncoder(max_width=preview_width, max_fps=preview_fps)
+            report = ReportModel(scorer.move_names)
+            last_panel = last_log = time.perf_counter()
+
+            for frame, result in session.frames(pipeline):
+                if result is None:
+                    # No frame yet (camera stalled or reconnecting)
+                    pass
+                elif result.landmarks is not None:
+                    session.touch()
+                    # Score every selected move on the one landmark result
+                    with session_profiler.time("analyze"):
+                        scorer.update(result.landmarks)
+                        if aligner is not None:
+                            reference_match = aligner.update(result.landmarks)
+
+                    # Draw landmarks on the frame
+                    with session_profiler.time("draw_landmarks"):
+                        draw_landmarks(frame, result.landmarks)
+
+                    # Motion was detected in the inference stage, before the overlay
+                    if result.moving:
+                        motion_feedback = "Motion detected! Keep moving."
+                    else:
+                        motion_feedback = "No significant motion detected."
+
+                    # Display the annotated frame as a downscaled, rate-limited JPEG
+                    with session_profiler.time("preview_encode"):
+                        jpeg = preview.maybe_encode(frame)
+                    if jpeg is not None:
+                        session_profiler.increment("preview_bytes", len(jpeg))
+                        with session_profiler.time("image_upload"):
+                            video_placeholder.image(jpeg, use_column_width=True)
+
+                    report.update(scorer.scores, scorer.feedback, motion_feedback)
+                else:
+                    if result.moving:
+                        session.touch()
+                    report.mark_missing()
+                if recorder is not None and result is not None:
+                    recorder.record(result.landmarks, scorer.scores, result.moving, result.inferred)
+
+                # Only send the report when its text changed, at a low fixed rate
+                with session_profiler.time("report"):
+                    report_text = report.poll()
+                if report_text is not None:
+                    report_placeholder.text(report_text)
+
+                # The panel is refreshed even without frames: each Streamlit
+                # call is where an interrupted run (Stop, page closed) ends
+                now = time.perf_counter()
+                if now - last_panel >= PANEL_INTERVAL:
+                    last_panel = now
+                    panel = session_profiler.panel(pipeline.stats.fps())
+                    if pose_workers:
+                        panel += f"\nPose in {pose_workers} worker process(es)"
+                    else:
+                        panel += f"\nPose every {engine.scheduler.interval} frame(s)"
+                    if reference_match is not None:
+                        panel += f"\nReference match: {reference_match:.0f}% ({aligner.progress() * 100:.0f}% through)"
+                    stats_placeholder.text(panel)
+                if json_log and now - last_log >= JSON_LOG_INTERVAL:
+                    last_log = now
+                    profiler.write_json_log(json_log)
+
+        # The last updates may have come within min_interval of the previous push
+        report_text = report.poll(force=True)
+        if report_text is not None:
+            report_placeholder.text(report_text)
+        reason = controller.finish()
+        if reason is not None:
+            st.write(f"Dance session ended: {reason}.")
+        if recorder is not None:
+            st.write(f"Session log written to {recorder.path} ({recorder.frames} frames)")
+            if recorder.error:
+                st.error(recorder.error)
+        if frame_profiler is not None:
+            if frame_profiler.written:
+                st.write(f"Profile written to {frame_profiler.path}")
+            else:
+                st.write("No frames were profiled.")
+        if pipeline.error:
+            st.error(pipeline.error)
+        cv2.destroyAllWindows()
+    else:
+        video_placeholder.text("Click 'Start Dance' to begin.")
+
+    # The session itself was already released when this rerun interrupted it
+    if stop_button:
+        st.write("Dance session stopped.")
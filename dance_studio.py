@@ -0,0 +1,20 @@
+import streamlit as st
+
+from dance_app import run_app
+from moves import DANCES, moves_for_dances
+
+def main():
+    selected = st.multiselect(
+        "Dances to score",
+        list(DANCES),
+        default=list(DANCES),
+        format_func=lambda name: DANCES[name]["label"],
+    )
+    run_app(
+        "Dance Studio",
+        "Use your webcam to perform any of the dances below; every selected dance is scored on the same pose pass!",
+        moves_for_dances(selected),
+    )
+
+if __name__ == "__main__":
+    main()
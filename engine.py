@@ -0,0 +1,153 @@
+import time
+from collections import namedtuple
+
+import cv2
+
+from history import LandmarkHistory
+from landmarks import landmark_bbox, landmarks_to_array
+from motion import MotionDetector
+from moves import MOVES, is_temporal
+from pose_provider import pose_solution
+from profiling import StageProfiler
+from scheduler import InferenceScheduler, LandmarkExtrapolator
+from startup import timed_import
+
+# What the inference stage hands to the render stage for one frame. landmarks is
+# a fresh (33, 4) array in full-frame coordinates (None when no pose is known)
+# and inferred tells whether pose.process() ran on this frame or the landmarks
+# were carried forward.
+FrameResult = namedtuple("FrameResult", "landmarks moving inferred")
+
+def array_to_landmark_list(landmarks):
+    landmark_pb2 = timed_import("mediapipe.framework.formats.landmark_pb2")
+    return landmark_pb2.NormalizedLandmarkList(landmark=[
+        landmark_pb2.NormalizedLandmark(x=x, y=y, z=z, visibility=visibility)
+        for x, y, z, visibility in landmarks.tolist()
+    ])
+
+def draw_landmarks(frame, landmarks):
+    solutions = timed_import("mediapipe").solutions
+    solutions.drawing_utils.draw_landmarks(
+        frame, array_to_landmark_list(landmarks), solutions.pose.POSE_CONNECTIONS
+    )
+
+class MoveScorer:
+    # Scoring state for one dancer: every selected move is scored on each new
+    # landmark array, with the history temporal moves and rule windows need
+    def __init__(self, move_names):
+        self.move_names = list(move_names)
+        self.scores = {name: 0 for name in self.move_names}
+        self.feedback = {name: "" for name in self.move_names}
+        # Temporal moves get their own tracker and share one landmark history
+        self.trackers = {name: MOVES[name]["tracker"]() for name in self.move_names if is_temporal(name)}
+        # Compiled rule plans run once per frame for all of their moves, over
+        # as many recent frames as their temporal windows need
+        self.plans = []
+        for name in self.move_names:
+            plan = MOVES[name].get("plan")
+            if plan is not None and plan not in self.plans:
+                self.plans.append(plan)
+        self.history = LandmarkHistory(max(
+            [tracker.history_size for tracker in self.trackers.values()] + [plan.window for plan in self.plans],
+            default=1,
+        ))
+
+    def update(self, landmarks):
+        # Score one (33, 4) array: fills scores and feedback, returns the codes
+        self.history.push(landmarks)
+        plan_codes = {}
+        for plan in self.plans:
+            frames = landmarks if plan.window == 1 else self.history.window(plan.window)
+            codes = plan.evaluate(frames)
+            plan_codes.update(codes if plan.window == 1 else {name: int(code[-1]) for name, code in codes.items()})
+        codes = {}
+        for name in self.move_names:
+            move = MOVES[name]
+            if name in self.trackers:
+                code = self.trackers[name].update(self.history)
+            elif name in plan_codes:
+                code = plan_codes[name]
+            else:
+                code = int(move["rule"](landmarks))
+            codes[name] = code
+            self.scores[name] = int(code > 0)
+            self.feedback[name] = move["feedback"][code]
+        return codes
+
+class DanceEngine:
+    # Runs one pose pass per frame and scores every selected move on it
+    def __init__(self, move_names, pose=None, scheduler=None, profiler=None, roi_tracker=None, smoother=None):
+        self.move_names = list(move_names)
+        self.pose = pose if pose is not None else pose_solution().Pose()
+        self.scheduler = scheduler if scheduler is not None else InferenceScheduler()
+        self.profiler = profiler if profiler is not None else StageProfiler()
+        # Optional RoiTracker: pose runs on a downscaled crop around the dancer
+        self.roi_tracker = roi_tracker
+        # Optional landmark filter (smoothing.py) applied to every inferred pose
+        self.smoother = smoother
+        self.motion_detector = MotionDetector()
+        self.extrapolator = LandmarkExtrapolator()
+        self.frame_index = 0
+        self.last_landmarks = None
+        self.scorer = MoveScorer(self.move_names)
+        self.scores = self.scorer.scores
+        self.feedback = self.scorer.feedback
+        self.landmarks = None
+
+    def process_frame(self, frame):
+        # Inference stage: motion gating, pose when scheduled, otherwise carry
+        # the last landmarks forward
+        self.frame_index += 1
+        received_at = time.perf_counter()
+        with self.profiler.time("detect_motion"):
+            moving = self.motion_detector.detect(frame, roi=landmark_bbox(self.last_landmarks))
+        inferred = self.scheduler.should_infer(moving)
+        if inferred:
+            landmarks = self._infer(frame)
+            if self.smoother is not None and landmarks is not None:
+                with self.profiler.time("smoothing"):
+                    landmarks = self.smoother(landmarks, received_at)
+            self.extrapolator.update(self.frame_index, landmarks)
+        else:
+            self.profiler.increment("skipped_inferences")
+            landmarks = self.extrapolator.predict(self.frame_index)
+        self.last_landmarks = landmarks
+        return FrameResult(landmarks, moving, inferred)
+
+    def _infer(self, frame):
+        # Only the model input is converted to RGB: the full frame, or the
+        # tracker's crop when an RoiTracker is set
+        started = time.perf_counter()
+        if self.roi_tracker is None:
+            image, box = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), None
+        else:
+            image, box = self.roi_tracker.prepare(frame)
+        self.profiler.observe("cvtColor", time.perf_counter() - started)
+        started = time.perf_counter()
+        results = self.pose.process(image)
+        latency = time.perf_counter() - started
+        self.profiler.observe("pose_process", latency)
+        self.scheduler.record_latency(latency)
+        landmarks = None
+        if results.pose_landmarks:
+            landmarks = landmarks_to_array(results.pose_landmarks.landmark)
+        if self.roi_tracker is not None:
+            if landmarks is not None:
+                landmarks = self.roi_tracker.map_back(landmarks, box, frame.shape)
+            elif self.roi_tracker.tracking:
+                # Lost the dancer inside the crop; the next frame is searched in full
+                self.profiler.increment("roi_lost")
+            self.roi_tracker.update(landmarks)
+        return landmarks
+
+    def score(self, landmarks):
+        # Fill the landmark array once, then every rule reads from it
+        self.landmarks = landmarks_to_array(landmarks, out=self.landmarks)
+        return self.score_array(self.landmarks)
+
+    def score_array(self, landmarks):
+        self.scorer.update(landmarks)
+        return self.scores
+
+    def draw(self, frame, landmarks):
+        draw_landmarks(frame, landmarks)
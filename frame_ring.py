@@ -0,0 +1,474 @@
+import argparse
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from pipeline import PipelineStats
+from pose_provider import TIERS
+from scheduler import MODES
+from sources import open_capture
+
+# Frames for pose worker processes without pickling them: a fixed set of
+# frame-sized slots in one shared memory block, plus a small header (slot
+# state, sequence number, capture time) guarded by one cross-process lock.
+# Readers sleep on a semaphore released once per committed frame rather than
+# on a multiprocessing.Condition, whose notify() waits for every sleeper to
+# wake and so hangs for good once a sleeping worker is killed.
+# The capture side copies each frame into a free slot; when every slot holds an
+# unread frame the oldest unread one is overwritten, or for a file source the
+# writer waits for a free slot instead. A reader claims the oldest ready
+# slot, works on a numpy view of it, and releases it.
+
+FREE, WRITING, READY, BUSY = range(4)
+
+# One claimed slot: frame is a view into shared memory, valid until release
+RingFrame = namedtuple("RingFrame", "seq slot frame captured_at")
+
+# Header counters
+NEXT_SEQ, WRITTEN, DROPPED, CLOSED = range(4)
+
+class FrameRing:
+    # Picklable into spawned processes (pass it as a Process argument): the
+    # child attaches to the same block by name and shares the lock
+    def __init__(self, slots, shape, dtype=np.uint8, ctx=None):
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.lock = ctx.Lock()
+        self.ready = ctx.Semaphore(0)
+        self.owner = True
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=self._header_bytes() + slots * self.frame_bytes)
+        self._attach()
+        self.states[:] = FREE
+        self.seqs[:] = -1
+        self.counters[:] = 0
+
+    def _header_bytes(self):
+        # states, seqs, capture times, counters; 64-byte aligned frames
+        size = 8 * (3 * self.slots + 4)
+        return -(-size // 64) * 64
+
+    def _attach(self):
+        buf = self.shm.buf
+        self.states = np.ndarray(self.slots, np.int64, buf, 0)
+        self.seqs = np.ndarray(self.slots, np.int64, buf, 8 * self.slots)
+        self.stamps = np.ndarray(self.slots, np.float64, buf, 16 * self.slots)
+        self.counters = np.ndarray(4, np.int64, buf, 24 * self.slots)
+        offset = self._header_bytes()
+        self.views = [
+            np.ndarray(self.shape, self.dtype, buf, offset + slot * self.frame_bytes)
+            for slot in range(self.slots)
+        ]
+
+    def __getstate__(self):
+        return {
+            "slots": self.slots, "shape": self.shape, "dtype": self.dtype.str,
+            "lock": self.lock, "ready": self.ready, "name": self.shm.name,
+        }
+
+    def __setstate__(self, state):
+        self.slots = state["slots"]
+        self.shape = state["shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.lock = state["lock"]
+        self.ready = state["ready"]
+        self.owner = False
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self._attach()
+
+    # Writer side (one writer)
+
+    def begin_write(self, overwrite=True):
+        # -> (slot, writable view), or None when every slot is claimed by a
+        # reader (or, with overwrite=False, holds an unread frame); the caller
+        # then waits for a release instead of capturing. Only an unread frame
+        # that gets overwritten counts as dropped.
+        with self.lock:
+            free = np.flatnonzero(self.states == FREE)
+            if len(free):
+                slot = int(free[0])
+            else:
+                ready = np.flatnonzero(self.states == READY)
+                if not overwrite or not len(ready):
+                    return None
+                slot = int(ready[np.argmin(self.seqs[ready])])
+                self.counters[DROPPED] += 1
+            self.states[slot] = WRITING
+        return slot, self.views[slot]
+
+    def commit(self, slot, captured_at=None):
+        # Publish a written slot; returns its sequence number
+        with self.lock:
+            seq = int(self.counters[NEXT_SEQ])
+            self.counters[NEXT_SEQ] += 1
+            self.counters[WRITTEN] += 1
+            self.seqs[slot] = seq
+            self.stamps[slot] = time.perf_counter() if captured_at is None else captured_at
+            self.states[slot] = READY
+        self.ready.release()
+        return seq
+
+    def abort(self, slot):
+        with self.lock:
+            self.states[slot] = FREE
+
+    def write(self, frame, captured_at=None):
+        # Copy a frame into a slot; None when every slot is claimed by a reader
+        claimed = self.begin_write()
+        if claimed is None:
+            return None
+        slot, view = claimed
+        np.copyto(view, frame)
+        return self.commit(slot, captured_at)
+
+    def close_writer(self):
+        # No more frames: readers drain what is ready, then read() returns None
+        with self.lock:
+            self.counters[CLOSED] = 1
+        self.ready.release()
+
+    # Reader side (any number of readers, in any process)
+
+    def read(self, timeout=None):
+        # Oldest ready frame as a RingFrame; None on timeout or once the
+        # writer closed and nothing is left
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                ready = np.flatnonzero(self.states == READY)
+                if len(ready):
+                    slot = int(ready[np.argmin(self.seqs[ready])])
+                    self.states[slot] = BUSY
+                    return RingFrame(int(self.seqs[slot]), slot, self.views[slot], float(self.stamps[slot]))
+                closed = bool(self.counters[CLOSED])
+            if closed:
+                # Pass the wake-up on to the next waiting reader
+                self.ready.release()
+                return None
+            # Permits of overwritten frames only cost one more look
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            if not self.ready.acquire(timeout=remaining):
+                return None
+
+    def release(self, slot):
+        with self.lock:
+            self.states[slot] = FREE
+
+    @property
+    def closed(self):
+        return bool(self.counters[CLOSED])
+
+    def stats(self):
+        with self.lock:
+            return {"written": int(self.counters[WRITTEN]), "dropped": int(self.counters[DROPPED])}
+
+    def close(self):
+        # Detach; the creating process also frees the block. Views handed out
+        # by read() must be dropped first or the mapping stays open until they
+        # are garbage collected.
+        self.states = self.seqs = self.stamps = self.counters = None
+        self.views = []
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+        if self.owner:
+            self.owner = False
+            self.shm.unlink()
+
+def engine_worker(ring, results, tier, pose_options, engine_options):
+    # Runs in a spawned process: the inference stage of a DanceEngine (motion
+    # gating, scheduling, ROI crop, pose, smoothing) on ring frames. Only the
+    # small FrameResult goes back through the queue; the slot stays claimed
+    # for the consumer, which scores and draws on the same frame and releases
+    # it. The sentinel None tells the consumer this worker is done.
+    from engine import DanceEngine
+    from pose_provider import provider
+    from roi import RoiTracker
+    from scheduler import InferenceScheduler
+    from smoothing import make_smoother
+
+    pose = None
+    try:
+        pose = provider.acquire(tier, **pose_options)
+        crop_size = engine_options.get("crop_size")
+        engine = DanceEngine(
+            [],
+            pose=pose,
+            scheduler=InferenceScheduler(engine_options.get("inference_mode", "always")),
+            roi_tracker=RoiTracker(max_side=crop_size) if crop_size else None,
+            smoother=make_smoother(engine_options.get("smoothing", "off")),
+        )
+        while True:
+            item = ring.read()
+            if item is None:
+                break
+            started = time.perf_counter()
+            result = engine.process_frame(item.frame)
+            results.put((item.seq, item.slot, item.captured_at, result, time.perf_counter() - started))
+            item = None
+    except Exception as e:
+        # Reported to the consumer as the pipeline's error
+        results.put(f"Pose worker failed: {e}")
+    finally:
+        if pose is not None:
+            provider.release(pose)
+        results.put(None)
+        ring.close()
+
+class RingPipeline:
+    # FramePipeline with the inference stage in worker processes: capture
+    # thread -> FrameRing -> `workers` spawned processes, each with its own
+    # DanceEngine -> frames() on the caller's thread, yielding (frame,
+    # FrameResult) like FramePipeline, so the caller scores and draws as
+    # before. The frame is a view into shared memory, valid until the caller
+    # asks for the next one. Results can finish out of order; for a live
+    # source ones older than the last yielded are dropped, while a file or
+    # stills source never overwrites an unread frame and its results are put
+    # back in capture order, so every frame is scored. With several workers
+    # each engine sees every workers-th frame, so its motion gate, scheduler
+    # and tracking work on that subsequence, which is fine at camera rates.
+    # A frame_profiler only sees the capture thread and the caller's; the
+    # inference runs in the workers.
+    def __init__(self, cap, workers=2, tier="full", slots=None, profiler=None, pose_options=None,
+                 inference_mode="always", crop_size=None, smoothing="off", frame_profiler=None):
+        self.cap = cap
+        self.live = getattr(cap, "live", True)
+        self.workers = workers
+        self.tier = tier
+        self.slots = slots or workers + 2
+        self.pose_options = dict(pose_options or {})
+        self.engine_options = {"inference_mode": inference_mode, "crop_size": crop_size, "smoothing": smoothing}
+        self.stats = PipelineStats(profiler=profiler)
+        self.frame_profiler = frame_profiler
+        self.ctx = multiprocessing.get_context("spawn")
+        self.results = self.ctx.Queue()
+        self.stop_event = threading.Event()
+        self.error = None
+        self.ring = None
+        self.processes = []
+        self.thread = None
+
+    def start(self):
+        # The ring is sized by the first frame
+        ret, frame = self.cap.read()
+        if not ret:
+            self.error = getattr(self.cap, "error", "Failed to capture video.")
+            self.stop_event.set()
+            return self
+        self.ring = FrameRing(self.slots, frame.shape, frame.dtype, self.ctx)
+        self.ring.write(frame)
+        self.processes = [
+            self.ctx.Process(
+                target=engine_worker,
+                args=(self.ring, self.results, self.tier, self.pose_options, self.engine_options),
+                name=f"pose-worker-{index}", daemon=True,
+            )
+            for index in range(self.workers)
+        ]
+        for process in self.processes:
+            process.start()
+        self.thread = threading.Thread(target=self._capture_loop, name="capture", daemon=True)
+        self.thread.start()
+        return self
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def _capture_loop(self):
+        # Sources decode into their own buffers (BlockingSource prefetches
+        # ahead), so each frame costs one copy into its slot
+        dropped = 0
+        while self.running:
+            if self.frame_profiler is not None:
+                self.frame_profiler.attach()
+            started = time.perf_counter()
+            claimed = self.ring.begin_write(overwrite=self.live)
+            if claimed is None:
+                # Every slot is with a worker or the consumer
+                time.sleep(0.001)
+                continue
+            slot, view = claimed
+            # Only this thread overwrites, so the counter can be read unlocked
+            self.stats.drop(int(self.ring.counters[DROPPED]) - dropped)
+            dropped = int(self.ring.counters[DROPPED])
+            ret, frame = self.cap.read()
+            if not ret:
+                self.ring.abort(slot)
+                self.error = getattr(self.cap, "error", "Failed to capture video.")
+                break
+            if frame.shape != view.shape:
+                cv2.resize(frame, (view.shape[1], view.shape[0]), dst=view)
+            else:
+                np.copyto(view, frame)
+            self.ring.commit(slot, started)
+            self.stats.record("capture", time.perf_counter() - started)
+        self.ring.close_writer()
+
+    def _workers_gone(self):
+        # Called when no result arrived in time. A worker that exits cleanly
+        # sends its sentinel first, so a crash (segfault, OOM kill) is a
+        # non-zero exit code; a crashed worker may also hold a slot forever,
+        # so the pipeline stops with an error.
+        for process in self.processes:
+            if process.exitcode not in (None, 0):
+                self.error = f"{process.name} exited with code {process.exitcode}"
+                self.stop_event.set()
+                return True
+        return all(process.exitcode is not None for process in self.processes)
+
+    def frames(self, timeout=0.1, heartbeat=False):
+        # Same contract as FramePipeline.frames(): (frame, FrameResult), and
+        # (None, None) heartbeats when heartbeat=True
+        last_seq = -1
+        waiting = {}
+        finished = 0
+        while finished < len(self.processes):
+            try:
+                item = self.results.get(timeout=timeout)
+            except queue.Empty:
+                if self._workers_gone():
+                    break
+                if heartbeat:
+                    yield None, None
+                continue
+            if item is None:
+                finished += 1
+                continue
+            if isinstance(item, str):
+                self.error = item
+                continue
+            seq, slot, captured_at, result, seconds = item
+            self.stats.record("inference", seconds)
+            if self.live:
+                if seq < last_seq:
+                    self.ring.release(slot)
+                    self.stats.drop()
+                    continue
+                ready = [item]
+            else:
+                # Sequence numbers have no gaps when nothing is overwritten
+                waiting[seq] = item
+                ready = []
+                while last_seq + 1 in waiting:
+                    ready.append(waiting.pop(last_seq + 1))
+                    last_seq += 1
+            for seq, slot, captured_at, result, seconds in ready:
+                last_seq = seq
+                if self.frame_profiler is not None:
+                    # Scoring and drawing; the inference is in the workers
+                    self.frame_profiler.attach(primary=True)
+                started = time.perf_counter()
+                try:
+                    yield self.ring.views[slot], result
+                finally:
+                    self.ring.release(slot)
+                self.stats.record("render", time.perf_counter() - started)
+                self.stats.frame_done(captured_at)
+                if self.frame_profiler is not None:
+                    self.frame_profiler.frame_done()
+        for seq, slot, captured_at, result, seconds in waiting.values():
+            self.ring.release(slot)
+        self.stop_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        if self.ring is None:
+            return
+        self.ring.close_writer()
+        deadline = time.monotonic() + 5.0
+        for process in self.processes:
+            # A worker only exits once its queued results are flushed
+            while process.is_alive() and time.monotonic() < deadline:
+                try:
+                    while True:
+                        self.results.get_nowait()
+                except queue.Empty:
+                    pass
+                process.join(timeout=0.05)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.ring.close()
+        self.ring = None
+
+def transport_benchmark(shape, frames=200):
+    # Per-frame cost of handing a frame to another process: pickling it (what
+    # a multiprocessing.Queue does, before the pipe write and unpickle) vs a
+    # ring write plus claiming a view
+    frame = np.random.randint(0, 256, shape, dtype=np.uint8)
+    started = time.perf_counter()
+    for _ in range(frames):
+        pickle.loads(pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL))
+    pickled = (time.perf_counter() - started) / frames
+    ring = FrameRing(2, shape)
+    try:
+        started = time.perf_counter()
+        for _ in range(frames):
+            ring.write(frame)
+            item = ring.read()
+            ring.release(item.slot)
+        shared = (time.perf_counter() - started) / frames
+        item = None
+    finally:
+        ring.close()
+    return {"pickle_ms": pickled * 1000, "ring_ms": shared * 1000}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run pose in worker processes fed through a shared-memory frame ring.")
+    parser.add_argument("source", nargs="?", default=None, help="Video file, camera index, image folder or stream URL")
+    parser.add_argument("--workers", type=int, default=2, help="Pose worker processes")
+    parser.add_argument("--slots", type=int, default=None, help="Ring slots (default: workers + 2)")
+    parser.add_argument("--tier", choices=tuple(TIERS), default="full", help="Pose model tier")
+    parser.add_argument("--inference-mode", choices=MODES, default="always", help="Pose inference scheduling")
+    parser.add_argument("--crop-size", type=int, default=None, help="Max side of the pose crop (default: full frame)")
+    parser.add_argument("--max-frames", type=int, default=0, help="Stop after this many frames (0 = whole source)")
+    parser.add_argument("--transport", default=None, metavar="HxW",
+                        help="Only compare pickle and ring transport cost for HxW BGR frames")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.transport:
+        height, width = (int(value) for value in args.transport.lower().split("x"))
+        timings = transport_benchmark((height, width, 3))
+        print(f"{height}x{width}: pickle {timings['pickle_ms']:.2f} ms/frame, ring {timings['ring_ms']:.2f} ms/frame")
+        return
+    if args.source is None:
+        raise SystemExit("Give a source, or --transport HxW.")
+    pipeline = RingPipeline(
+        open_capture(args.source), args.workers, args.tier, args.slots,
+        inference_mode=args.inference_mode, crop_size=args.crop_size,
+    ).start()
+    detected = 0
+    try:
+        for index, (frame, result) in enumerate(pipeline.frames()):
+            detected += result.landmarks is not None
+            if args.max_frames and index + 1 >= args.max_frames:
+                break
+    finally:
+        ring_stats = pipeline.ring.stats() if pipeline.ring is not None else {}
+        pipeline.stop()
+    if pipeline.error:
+        print(pipeline.error)
+    print(pipeline.stats.summary())
+    print(f"Frames with a pose: {detected}. Ring: {ring_stats}")
+
+if __name__ == "__main__":
+    main()
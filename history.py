@@ -0,0 +1,172 @@
+from collections import deque
+
+import numpy as np
+
+from landmarks import (
+    LEFT_ANKLE, LEFT_HIP, NUM_LANDMARKS, RIGHT_ANKLE, RIGHT_HIP, X, Y,
+)
+
+class LandmarkHistory:
+    # Fixed-size ring buffer of recent (33, 4) landmark arrays. push() and get()
+    # are O(1); nothing is reallocated or shifted as frames arrive.
+    def __init__(self, capacity=60):
+        self.capacity = capacity
+        self.buffer = np.full((capacity, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def clear(self):
+        self.count = 0
+
+    def push(self, landmarks):
+        self.buffer[self.count % self.capacity] = landmarks
+        self.count += 1
+
+    def get(self, age=0):
+        # age 0 is the newest frame, age 1 the one before, ...
+        if age >= len(self):
+            return None
+        return self.buffer[(self.count - 1 - age) % self.capacity]
+
+    def window(self, size=None):
+        # Ordered copy of the last `size` frames, oldest first
+        size = len(self) if size is None else min(size, len(self))
+        indices = np.arange(self.count - size, self.count) % self.capacity
+        return self.buffer[indices]
+
+class SlidingVelocity:
+    # Mean per-frame velocity of some landmarks along one axis over the last
+    # `window` frames, from two ring lookups instead of a rescan
+    def __init__(self, indices, axis, window=10):
+        self.indices = list(indices)
+        self.axis = axis
+        self.window = window
+
+    def value(self, history):
+        age = min(self.window, len(history) - 1)
+        if age <= 0:
+            return 0.0
+        newest = history.get(0)[self.indices, self.axis]
+        oldest = history.get(age)[self.indices, self.axis]
+        velocity = float(np.mean(newest - oldest)) / age
+        return velocity if np.isfinite(velocity) else 0.0
+
+class PhaseDetector:
+    # Two-phase hysteresis on a scalar signal: the phase only flips to +1 above
+    # `high` and to -1 below `low`, so jitter around zero is ignored
+    def __init__(self, low=-0.02, high=0.02):
+        self.low = low
+        self.high = high
+        self.phase = 0
+
+    def reset(self):
+        self.phase = 0
+
+    def update(self, value):
+        # Returns True when the phase changed on this frame
+        if not np.isfinite(value):
+            return False
+        previous = self.phase
+        if value > self.high:
+            self.phase = 1
+        elif value < self.low:
+            self.phase = -1
+        return previous != 0 and self.phase != previous
+
+class StepCounter:
+    # A step is counted each time the lower ankle switches sides
+    def __init__(self, hysteresis=0.02):
+        self.detector = PhaseDetector(-hysteresis, hysteresis)
+        self.steps = 0
+
+    def update(self, landmarks):
+        stepped = self.detector.update(landmarks[LEFT_ANKLE, Y] - landmarks[RIGHT_ANKLE, Y])
+        if stepped:
+            self.steps += 1
+        return stepped
+
+class MoonwalkTracker:
+    # Backward slide: the feet travel sideways across the frame while the hips
+    # stay level and the weight keeps switching from one foot to the other
+    def __init__(self, window=15, min_foot_speed=0.004, max_hip_bounce=0.003, min_steps=2):
+        self.history_size = window + 1
+        self.window = window
+        self.min_foot_speed = min_foot_speed
+        self.max_hip_bounce = max_hip_bounce
+        self.feet = SlidingVelocity([LEFT_ANKLE, RIGHT_ANKLE], X, window)
+        self.hips = SlidingVelocity([LEFT_HIP, RIGHT_HIP], Y, window)
+        self.steps = StepCounter()
+        self.step_frames = deque(maxlen=min_steps)
+        self.frame = 0
+
+    def update(self, history):
+        self.frame += 1
+        if self.steps.update(history.get(0)):
+            self.step_frames.append(self.frame)
+        recent_steps = (
+            len(self.step_frames) == self.step_frames.maxlen
+            and self.frame - self.step_frames[0] <= self.window
+        )
+        sliding = abs(self.feet.value(history)) >= self.min_foot_speed
+        still = abs(self.hips.value(history)) <= self.max_hip_bounce
+        return int(sliding and still and recent_steps)
+
+class GrapevineTracker:
+    # Phase machine for "right, cross behind, step, tap", advanced once per frame.
+    # In the open stance the right ankle is left of the left ankle in the image
+    # (as check_grapevine assumes); crossing behind swaps their order.
+    PHASES = ("side_step", "cross_behind", "step", "tap")
+
+    def __init__(self, window=5, min_hip_speed=0.003, spread=0.08, together=0.04,
+                 max_phase_frames=30, hold_frames=15):
+        self.history_size = window + 1
+        self.hips = SlidingVelocity([LEFT_HIP, RIGHT_HIP], X, window)
+        self.min_hip_speed = min_hip_speed
+        self.spread = spread
+        self.together = together
+        self.max_phase_frames = max_phase_frames
+        self.hold_frames = hold_frames
+        self.phase = 0
+        self.phase_frames = 0
+        self.since_complete = None
+        self.completed = 0
+
+    def _phase_done(self, landmarks, history):
+        gap = landmarks[LEFT_ANKLE, X] - landmarks[RIGHT_ANKLE, X]
+        phase = self.PHASES[self.phase]
+        if phase == "side_step":
+            return abs(self.hips.value(history)) >= self.min_hip_speed and gap > self.spread
+        if phase == "cross_behind":
+            return gap < 0
+        if phase == "step":
+            return gap > self.spread
+        return abs(gap) < self.together
+
+    def update(self, history):
+        if self.since_complete is not None:
+            self.since_complete += 1
+        if self._phase_done(history.get(0), history):
+            self.phase += 1
+            self.phase_frames = 0
+            if self.phase == len(self.PHASES):
+                self.completed += 1
+                self.since_complete = 0
+                self.phase = 0
+        else:
+            self.phase_frames += 1
+            if self.phase_frames > self.max_phase_frames:
+                # Took too long: start the pattern over
+                self.phase = 0
+                self.phase_frames = 0
+        return int(self.since_complete is not None and self.since_complete <= self.hold_frames)
+
+def score_sequence(tracker, landmarks):
+    # Run a temporal tracker over an (N, 33, 4) sequence: (N,) int8 codes
+    history = LandmarkHistory(tracker.history_size)
+    codes = np.zeros(len(landmarks), dtype=np.int8)
+    for index, frame in enumerate(landmarks):
+        history.push(frame)
+        codes[index] = tracker.update(history)
+    return codes
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Bump when the stored layout or the extraction itself changes
+CACHE_VERSION = 2
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(path, pose_settings):
+    # Same video content and same Pose settings -> same landmarks
+    settings = json.dumps(pose_settings or {}, sort_keys=True)
+    payload = f"{CACHE_VERSION}:{file_digest(path)}:{settings}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class LandmarkCache:
+    # Per-video (frames, 33, 4) landmark arrays and motion flags stored as .npy
+    # files and loaded memory-mapped, so re-scoring never decodes the video.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".landmarks.npy", base + ".motion.npy", base + ".json"
+
+    def load(self, key):
+        landmarks_path, motion_path, meta_path = self._paths(key)
+        # The metadata file is written last, so its presence marks a complete entry
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # Empty entries stored by older versions for unreadable files
+        if not meta.get("frames"):
+            return None
+        landmarks = np.load(landmarks_path, mmap_mode="r")
+        motion_flags = np.load(motion_path, mmap_mode="r")
+        return landmarks, motion_flags, meta["fps"]
+
+    def store(self, key, landmarks, motion_flags, fps, source=None):
+        landmarks_path, motion_path, meta_path = self._paths(key)
+        for path, array in ((landmarks_path, landmarks), (motion_path, motion_flags)):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+        meta = {
+            "version": CACHE_VERSION,
+            "fps": fps,
+            "frames": int(len(landmarks)),
+            "source": source,
+        }
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
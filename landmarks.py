@@ -0,0 +1,61 @@
+import numpy as np
+
+# Compact landmark representation: one (33, 4) float32 row per frame holding
+# x, y, z and visibility. Indices mirror mp.solutions.pose.PoseLandmark, so the
+# array can be used without importing mediapipe.
+NUM_LANDMARKS = 33
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+NOSE = 0
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_ELBOW = 13
+RIGHT_ELBOW = 14
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+LEFT_ANKLE = 27
+RIGHT_ANKLE = 28
+LEFT_HEEL = 29
+RIGHT_HEEL = 30
+LEFT_FOOT_INDEX = 31
+RIGHT_FOOT_INDEX = 32
+
+def empty_landmarks(frames=None):
+    # NaN marks frames where no pose was found
+    shape = (NUM_LANDMARKS, 4) if frames is None else (frames, NUM_LANDMARKS, 4)
+    return np.full(shape, np.nan, dtype=np.float32)
+
+def landmarks_to_array(landmarks, out=None):
+    # Fill a (33, 4) array from a MediaPipe landmark list in one pass
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    out[:] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks]
+    return out
+
+def as_landmark_array(landmarks):
+    # Accept a landmark list, a (33, 4) array or an (N, 33, 4) batch
+    if isinstance(landmarks, np.ndarray):
+        return landmarks.astype(np.float32, copy=False)
+    return landmarks_to_array(landmarks)
+
+def landmark_bbox(landmarks, margin=0.1, min_visibility=0.5):
+    # Normalized (x0, y0, x1, y1) box around the visible landmarks, or None
+    if landmarks is None:
+        return None
+    visible = landmarks[landmarks[:, VISIBILITY] >= min_visibility]
+    if not len(visible) or np.isnan(visible[:, :2]).any():
+        return None
+    x0, y0 = visible[:, :2].min(axis=0)
+    x1, y1 = visible[:, :2].max(axis=0)
+    pad_x = (x1 - x0) * margin
+    pad_y = (y1 - y0) * margin
+    return (
+        max(0.0, float(x0 - pad_x)),
+        max(0.0, float(y0 - pad_y)),
+        min(1.0, float(x1 + pad_x)),
+        min(1.0, float(y1 + pad_y)),
+    )
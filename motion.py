@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+
+# Motion detection parameters
+motion_threshold = 5000  # Changed pixels at 640x480; adjust based on sensitivity
+REFERENCE_AREA = 640 * 480
+PIXEL_THRESHOLD = 30
+
+class MotionDetector:
+    # Per-stream frame differencing on a downscaled gray image. All buffers are
+    # allocated once per input size and reused, and the motion threshold is a
+    # fraction of the analysed area so it holds at any resolution or ROI size.
+    def __init__(self, threshold=motion_threshold, width=160, pixel_threshold=PIXEL_THRESHOLD):
+        self.threshold_ratio = threshold / REFERENCE_AREA
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.last_count = 0
+        self.last_ratio = 0.0
+        self.shape = None
+        self.primed = False
+
+    def reset(self):
+        self.primed = False
+
+    def _allocate(self, frame):
+        height, width = frame.shape[:2]
+        scaled_width = min(self.width, width)
+        scaled_height = max(1, round(height * scaled_width / width))
+        self.size = (scaled_width, scaled_height)
+        self.small = np.empty((scaled_height, scaled_width, 3), dtype=np.uint8)
+        self.gray = np.empty((scaled_height, scaled_width), dtype=np.uint8)
+        self.previous_gray = np.empty_like(self.gray)
+        self.diff = np.empty_like(self.gray)
+        self.shape = frame.shape
+        self.primed = False
+
+    def detect(self, frame, roi=None):
+        # roi is an optional normalized (x0, y0, x1, y1) box, e.g. the pose bounding box
+        if frame.shape != self.shape:
+            self._allocate(frame)
+        cv2.resize(frame, self.size, dst=self.small, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if not self.primed:
+            self.gray, self.previous_gray = self.previous_gray, self.gray
+            self.primed = True
+            return False
+
+        cv2.absdiff(self.previous_gray, self.gray, dst=self.diff)
+        cv2.threshold(self.diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self.diff)
+        region = self.diff
+        if roi is not None:
+            height, width = self.diff.shape
+            x0, y0, x1, y1 = roi
+            region = self.diff[
+                max(0, int(y0 * height)):min(height, int(y1 * height) + 1),
+                max(0, int(x0 * width)):min(width, int(x1 * width) + 1),
+            ]
+        area = region.size
+        self.last_count = cv2.countNonZero(region) if area else 0
+        self.last_ratio = self.last_count / area if area else 0.0
+
+        # Update last frame by swapping buffers
+        self.gray, self.previous_gray = self.previous_gray, self.gray
+        return self.last_ratio > self.threshold_ratio
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+
+from history import GrapevineTracker, MoonwalkTracker, score_sequence
+from landmarks import as_landmark_array
+from rules import RulePlan, load_spec
+
+# Declarative definitions of the built-in per-frame moves and the dances
+BUILTIN_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "moves.json")
+
+# Registry of move scorers: name -> {"label", "rule" or "tracker", "feedback"}.
+# A rule takes a (33, 4) landmark array or an (N, 33, 4) batch and returns an
+# integer code per frame; code 0 means the move was missed and indexes the
+# feedback tuple, any other code is a hit with its own feedback line.
+# A tracker is a factory for a temporal scorer whose update(history) returns
+# the same kind of code from a LandmarkHistory of recent frames.
+# Moves loaded from a rule file also carry the compiled "plan" they share.
+MOVES = {}
+
+# Dances and the moves that make them up
+DANCES = {}
+
+def register_move(name, label, rule, feedback):
+    MOVES[name] = {"label": label, "rule": rule, "feedback": tuple(feedback)}
+    return rule
+
+def register_temporal_move(name, label, tracker, feedback):
+    MOVES[name] = {"label": label, "tracker": tracker, "feedback": tuple(feedback)}
+    return tracker
+
+def is_temporal(name):
+    return "tracker" in MOVES[name]
+
+def batchable(name):
+    # Moves that only read the current frame, so frames of different dancers
+    # or clients can be scored together in one vectorized call
+    plan = MOVES[name].get("plan")
+    return not is_temporal(name) and (plan is None or plan.window == 1)
+
+def register_dance(name, label, move_names):
+    DANCES[name] = {"label": label, "moves": list(move_names)}
+
+def moves_for_dances(dance_names):
+    # Flatten dances into their moves, keeping order and dropping duplicates
+    move_names = []
+    for dance in dance_names:
+        for name in DANCES[dance]["moves"]:
+            if name not in move_names:
+                move_names.append(name)
+    return move_names
+
+def evaluate(name, landmarks):
+    # Score one frame: returns (score, feedback) like the original check_* functions
+    move = MOVES[name]
+    landmarks = as_landmark_array(landmarks)
+    if is_temporal(name):
+        code = int(score_sequence(move["tracker"](), landmarks[None])[-1])
+    else:
+        code = int(move["rule"](landmarks))
+    return int(code > 0), move["feedback"][code]
+
+def score_batch(landmarks, move_names=None):
+    # Score an (N, 33, 4) batch in one vectorized call: name -> (N,) int8 scores.
+    # Temporal moves treat the batch as one session and run their tracker over it.
+    return {name: (codes > 0).astype(np.int8) for name, codes in code_batch(landmarks, move_names).items()}
+
+def code_batch(landmarks, move_names=None):
+    # Like score_batch, but the raw codes that index each move's feedback
+    landmarks = as_landmark_array(landmarks)
+    names = MOVES if move_names is None else move_names
+    codes_by_move = {}
+    plan_codes = {}
+    for name in names:
+        move = MOVES[name]
+        if is_temporal(name):
+            codes = score_sequence(move["tracker"](), landmarks)
+        elif "plan" in move:
+            # One pass of the shared plan scores all of its moves
+            plan = move["plan"]
+            if id(plan) not in plan_codes:
+                plan_codes[id(plan)] = plan.evaluate(landmarks)
+            codes = plan_codes[id(plan)][name]
+        else:
+            codes = move["rule"](landmarks)
+        codes_by_move[name] = np.asarray(codes, dtype=np.int8)
+    return codes_by_move
+
+def load_moves(path):
+    # Compile a declarative rule file (see rules.py) into one plan and register
+    # its moves and dances. Each move keeps a per-move rule for evaluate(); the
+    # engine and score_batch run the shared plan once for all of its moves.
+    spec = load_spec(path)
+    plan = RulePlan(spec.get("moves", {}), spec.get("min_visibility"))
+    for name, move in spec.get("moves", {}).items():
+        register_move(name, move["label"], plan_rule(plan, name), move["feedback"])
+        MOVES[name]["plan"] = plan
+    for name, dance in spec.get("dances", {}).items():
+        register_dance(name, dance["label"], dance["moves"])
+    return plan
+
+def plan_rule(plan, name):
+    def rule(lm):
+        return plan.evaluate(lm)[name]
+    return rule
+
+load_moves(BUILTIN_RULES)
+
+register_temporal_move("moonwalk_slide", "Moonwalk Slide", MoonwalkTracker, (
+    "Slide your feet backward one at a time while keeping your hips level.",
+    "Smooth backward slide! Keep your upper body still.",
+))
+register_temporal_move("grapevine_sequence", "Grape Vine Sequence", GrapevineTracker, (
+    "Finish the whole pattern: right, cross behind, step, tap.",
+    "Full grapevine completed! Keep the rhythm.",
+))
+
+def check_posture(landmarks):
+    return evaluate("posture", landmarks)
+
+def check_footwork(landmarks):
+    return evaluate("footwork", landmarks)
+
+def check_arm_movement(landmarks):
+    return evaluate("arm_movement", landmarks)
+
+def check_salsa(landmarks):
+    return evaluate("salsa", landmarks)
+
+def check_moonwalk(landmarks):
+    return evaluate("moonwalk", landmarks)
+
+def check_grapevine(landmarks):
+    return evaluate("grapevine", landmarks)
+
+def check_shoulder_lean(landmarks):
+    return evaluate("shoulder_lean", landmarks)
+
+# Extra rule files, e.g. new dances, listed in FINAL_DANCE_RULES
+for path in filter(None, os.environ.get("FINAL_DANCE_RULES", "").split(os.pathsep)):
+    load_moves(path)
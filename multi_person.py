@@ -0,0 +1,364 @@
+import argparse
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from batch_score import write_table
+from engine import MoveScorer, array_to_landmark_list
+from landmarks import landmark_bbox, landmarks_to_array
+from moves import DANCES, MOVES, batchable, code_batch, moves_for_dances
+from pose_provider import TIERS, pose_solution, provider
+from profiling import StageProfiler
+from roi import RoiTracker
+from sources import open_capture
+from startup import timed_import
+
+# Several dancers in front of one camera. MediaPipe Pose follows a single
+# person, so people are found by a detector, kept apart by an IoU tracker, and
+# each track runs its own Pose on a crop around it (RoiTracker). Per-frame
+# moves of every dancer are scored together in one vectorized call; temporal
+# moves keep their state per dancer. Cost per frame is one detection plus one
+# crop-sized pose pass per dancer.
+
+DETECTORS = ("hog", "pose")
+
+# One dancer in one frame: box is normalized (x0, y0, x1, y1), landmarks the
+# full-frame (33, 4) array or None when the pose was lost this frame
+DancerResult = namedtuple("DancerResult", "track_id box landmarks")
+
+def iou_matrix(boxes_a, boxes_b):
+    # (A, 4) x (B, 4) normalized boxes -> (A, B) intersection over union
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)[:, None]
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)[None]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+def match_boxes(boxes_a, boxes_b, threshold=0.3):
+    # Greedy one-to-one matching by descending IoU: [(a, b)] index pairs
+    if not len(boxes_a) or not len(boxes_b):
+        return []
+    ious = iou_matrix(boxes_a, boxes_b)
+    pairs = []
+    used_a, used_b = set(), set()
+    for flat in np.argsort(ious, axis=None)[::-1]:
+        a, b = divmod(int(flat), ious.shape[1])
+        if ious[a, b] < threshold:
+            break
+        if a not in used_a and b not in used_b:
+            used_a.add(a)
+            used_b.add(b)
+            pairs.append((a, b))
+    return pairs
+
+class HogDetector:
+    # OpenCV's HOG people detector on a downscaled frame. Cheap and needs no
+    # model download, but only finds upright, mostly unoccluded people.
+    def __init__(self, width=480, min_score=0.3):
+        self.width = width
+        self.min_score = min_score
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def __call__(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width)
+        small = cv2.resize(frame, (round(width * scale), round(height * scale))) if scale < 1 else frame
+        rects, weights = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if not len(rects):
+            return []
+        keep = cv2.dnn.NMSBoxes(rects.tolist(), np.ravel(weights).tolist(), self.min_score, 0.4)
+        small_height, small_width = small.shape[:2]
+        return [
+            (x / small_width, y / small_height, (x + w) / small_width, (y + h) / small_height)
+            for x, y, w, h in (rects[index] for index in np.ravel(keep))
+        ]
+
+class PoseDetector:
+    # Finds people with MediaPipe itself: a static-image Pose on the
+    # downscaled frame returns the most prominent person, whose box is then
+    # blanked out and the frame searched again, up to max_people times. Works
+    # wherever the pose model does (also on drawings), but costs one pose pass
+    # per person, so use it with detect_every > 1.
+    def __init__(self, max_people=6, side=640, tier="full", margin=0.1):
+        self.max_people = max_people
+        self.side = side
+        self.margin = margin
+        self.pose = provider.acquire(tier, static_image_mode=True)
+
+    def __call__(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.side / max(height, width))
+        image = cv2.resize(frame, (round(width * scale), round(height * scale))) if scale < 1 else frame.copy()
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        fill = image.reshape(-1, 3).mean(axis=0)
+        small_height, small_width = image.shape[:2]
+        boxes = []
+        while len(boxes) < self.max_people:
+            results = self.pose.process(image)
+            if not results.pose_landmarks:
+                break
+            box = landmark_bbox(landmarks_to_array(results.pose_landmarks.landmark), self.margin)
+            if box is None or box[2] <= box[0] or box[3] <= box[1]:
+                break
+            boxes.append(box)
+            x0, y0, x1, y1 = box
+            image[int(y0 * small_height):int(y1 * small_height) + 1,
+                  int(x0 * small_width):int(x1 * small_width) + 1] = fill
+        return boxes
+
+    def close(self):
+        provider.release(self.pose)
+
+def make_detector(kind="hog", **options):
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown detector {kind!r}, expected one of {DETECTORS}")
+    if kind == "pose":
+        return PoseDetector(**options)
+    return HogDetector(**options)
+
+class Dancer:
+    # One track: its own Pose (tracking state is per person), a RoiTracker
+    # for the crop, and the temporal moves' state
+    def __init__(self, track_id, box, pose, move_names, crop_side):
+        self.track_id = track_id
+        self.pose = pose
+        self.roi = RoiTracker(max_side=crop_side)
+        self.roi.roi = box
+        self.scorer = MoveScorer([name for name in move_names if not batchable(name)])
+        self.scores = {}
+        self.feedback = {}
+        self.landmarks = None
+        self.missed = 0
+        self.frames = 0
+        self.hits = dict.fromkeys(move_names, 0)
+
+    @property
+    def box(self):
+        return self.roi.roi
+
+class MultiPersonEngine:
+    # detect (every detect_every frames) -> match detections to tracks by IoU
+    # -> one pose pass per track on its crop -> batched scoring. A track whose
+    # pose is lost keeps its last box and is dropped after max_missed frames
+    # without a pose or a matching detection. Tracks whose boxes overlap by
+    # merge_iou or more have converged on one dancer; the younger is dropped.
+    def __init__(self, move_names, detector=None, tier="full", max_people=6, detect_every=1, crop_side=256,
+                 iou_threshold=0.3, max_missed=15, margin=0.15, merge_iou=0.6, profiler=None):
+        self.move_names = list(move_names)
+        self.batched = [name for name in self.move_names if batchable(name)]
+        self.detector = detector if detector is not None else HogDetector()
+        self.tier = tier
+        self.max_people = max_people
+        self.detect_every = detect_every
+        self.crop_side = crop_side
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.margin = margin
+        self.merge_iou = merge_iou
+        self.profiler = profiler if profiler is not None else StageProfiler()
+        self.dancers = {}
+        self.next_id = 1
+        self.frame_index = 0
+
+    def _pad(self, box, frame_shape):
+        # Add the margin, then widen the short side to a square in pixels: the
+        # model letterboxes its input to a square anyway, so the extra context
+        # costs nothing and helps it find a tall, narrow person
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = box
+        half = max((x1 - x0) * width, (y1 - y0) * height) * (1 + 2 * self.margin) / 2
+        center_x, center_y = (x0 + x1) / 2, (y0 + y1) / 2
+        return (
+            max(0.0, center_x - half / width), max(0.0, center_y - half / height),
+            min(1.0, center_x + half / width), min(1.0, center_y + half / height),
+        )
+
+    def _merge_duplicates(self):
+        # Both tracks keep finding a pose on the shared dancer, so neither
+        # would ever be dropped as missed; the older ID is kept
+        dancers = list(self.dancers.values())
+        if len(dancers) < 2:
+            return
+        overlaps = np.triu(iou_matrix([dancer.box for dancer in dancers], [dancer.box for dancer in dancers]), k=1)
+        for first, second in zip(*np.nonzero(overlaps >= self.merge_iou)):
+            older, younger = dancers[first], dancers[second]
+            if older.track_id in self.dancers and younger.track_id in self.dancers:
+                self._drop(younger)
+                self.profiler.increment("merged_tracks")
+
+    def _associate(self, frame):
+        self._merge_duplicates()
+        with self.profiler.time("detect"):
+            boxes = [self._pad(box, frame.shape) for box in self.detector(frame)]
+        dancers = list(self.dancers.values())
+        matched = set()
+        for track, detection in match_boxes([dancer.box for dancer in dancers], boxes, self.iou_threshold):
+            dancers[track].missed = 0
+            matched.add(detection)
+            if not dancers[track].roi.tracking:
+                dancers[track].roi.roi = boxes[detection]
+        for index, box in enumerate(boxes):
+            if index in matched or len(self.dancers) >= self.max_people:
+                continue
+            # A second detection of an already tracked dancer would only be merged away again
+            tracked = [dancer.box for dancer in self.dancers.values()]
+            if tracked and iou_matrix([box], tracked).max() >= self.merge_iou:
+                continue
+            dancer = Dancer(
+                self.next_id, box, provider.acquire(self.tier), self.move_names, self.crop_side
+            )
+            self.dancers[dancer.track_id] = dancer
+            self.next_id += 1
+
+    def _infer(self, dancer, frame):
+        box = dancer.box
+        image, crop = dancer.roi.prepare(frame)
+        started = time.perf_counter()
+        results = dancer.pose.process(image)
+        self.profiler.observe("pose_process", time.perf_counter() - started)
+        landmarks = None
+        if results.pose_landmarks:
+            landmarks = dancer.roi.map_back(landmarks_to_array(results.pose_landmarks.landmark), crop, frame.shape)
+            dancer.roi.update(landmarks)
+        if landmarks is None or not dancer.roi.tracking:
+            # Keep searching the last box instead of the whole frame, which
+            # would find whichever dancer is most prominent
+            dancer.roi.roi = box
+            dancer.missed += 1
+            return None
+        dancer.missed = 0
+        return landmarks
+
+    def process_frame(self, frame):
+        # BGR frame -> [DancerResult] for every live track
+        if self.frame_index % self.detect_every == 0:
+            self._associate(frame)
+        self.frame_index += 1
+        results = []
+        for dancer in list(self.dancers.values()):
+            dancer.landmarks = self._infer(dancer, frame)
+            if dancer.missed > self.max_missed:
+                self._drop(dancer)
+                continue
+            results.append(DancerResult(dancer.track_id, dancer.box, dancer.landmarks))
+        self.profiler.increment("dancers", len(results))
+        return results
+
+    def score(self, results):
+        # Per-frame moves for every dancer with a pose in one code_batch call;
+        # temporal moves through each dancer's own MoveScorer
+        seen = [self.dancers[result.track_id] for result in results if result.landmarks is not None]
+        if not seen:
+            return {}
+        with self.profiler.time("analyze"):
+            codes = {}
+            if self.batched:
+                codes = code_batch(np.stack([dancer.landmarks for dancer in seen]), self.batched)
+            for row, dancer in enumerate(seen):
+                dancer_codes = {name: int(codes[name][row]) for name in self.batched}
+                dancer_codes.update(dancer.scorer.update(dancer.landmarks))
+                dancer.frames += 1
+                for name, code in dancer_codes.items():
+                    dancer.scores[name] = int(code > 0)
+                    dancer.feedback[name] = MOVES[name]["feedback"][code]
+                    dancer.hits[name] += int(code > 0)
+        return {dancer.track_id: dict(dancer.scores) for dancer in seen}
+
+    def draw(self, frame, results):
+        drawing = timed_import("mediapipe").solutions.drawing_utils
+        height, width = frame.shape[:2]
+        for result in results:
+            x0, y0, x1, y1 = result.box
+            corner = (int(x0 * width), int(y0 * height))
+            cv2.rectangle(frame, corner, (int(x1 * width), int(y1 * height)), (0, 255, 0), 2)
+            cv2.putText(frame, f"#{result.track_id}", (corner[0] + 4, corner[1] + 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            if result.landmarks is not None:
+                drawing.draw_landmarks(frame, array_to_landmark_list(result.landmarks),
+                                       pose_solution().POSE_CONNECTIONS)
+
+    def _drop(self, dancer):
+        self.dancers.pop(dancer.track_id, None)
+        provider.release(dancer.pose)
+
+    def close(self):
+        for dancer in list(self.dancers.values()):
+            self._drop(dancer)
+        if hasattr(self.detector, "close"):
+            self.detector.close()
+
+def score_stream(source, move_names, **options):
+    # Per-dancer score stream of a whole source: yields (frame index, seconds
+    # spent on the frame, [DancerResult], {track_id: {move: 0/1}})
+    cap = open_capture(source)
+    engine = MultiPersonEngine(move_names, **options)
+    try:
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            started = time.perf_counter()
+            results = engine.process_frame(frame)
+            scores = engine.score(results)
+            yield index, time.perf_counter() - started, results, scores
+            index += 1
+    finally:
+        engine.close()
+        cap.release()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score every dancer in a video separately.")
+    parser.add_argument("source", help="Video file, camera index, image folder or stream URL")
+    parser.add_argument("--dance", action="append", choices=sorted(DANCES),
+                        help="Dance to score (repeatable, default: all)")
+    parser.add_argument("--out", default="dancers.csv", help="Per-frame, per-dancer score table (.csv or .parquet)")
+    parser.add_argument("--detector", choices=DETECTORS, default="hog")
+    parser.add_argument("--detect-every", type=int, default=1, help="Run the person detector every N frames")
+    parser.add_argument("--max-people", type=int, default=6)
+    parser.add_argument("--crop-side", type=int, default=256, help="Max side of each dancer's pose crop (px)")
+    parser.add_argument("--tier", choices=tuple(TIERS), default="full", help="Pose model tier")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    move_names = moves_for_dances(args.dance) if args.dance else list(MOVES)
+    detector_options = {"max_people": args.max_people, "tier": args.tier} if args.detector == "pose" else {}
+    rows = []
+    timings = {}
+    dancers = {}
+    stream = score_stream(
+        args.source, move_names, detector=make_detector(args.detector, **detector_options), tier=args.tier,
+        max_people=args.max_people, detect_every=args.detect_every, crop_side=args.crop_side,
+    )
+    for index, seconds, results, scores in stream:
+        timings.setdefault(len(results), []).append(seconds)
+        for result in results:
+            row = {"frame": index, "dancer": result.track_id, "detected": int(result.landmarks is not None)}
+            row.update(zip(("x0", "y0", "x1", "y1"), result.box))
+            for name in move_names:
+                row[name] = scores[result.track_id][name] if result.track_id in scores else None
+            rows.append(row)
+            counts = dancers.setdefault(result.track_id, {"frames": 0, "hits": dict.fromkeys(move_names, 0)})
+            if result.track_id in scores:
+                counts["frames"] += 1
+                for name in move_names:
+                    counts["hits"][name] += scores[result.track_id][name]
+    write_table(rows, args.out, "parquet" if args.out.endswith(".parquet") else "csv")
+    for count, values in sorted(timings.items()):
+        print(f"{count} dancer(s): {np.mean(values) * 1000:.1f} ms/frame over {len(values)} frames")
+    for track_id, counts in sorted(dancers.items()):
+        rates = ", ".join(
+            f"{MOVES[name]['label']} {counts['hits'][name] / counts['frames'] * 100:.0f}%"
+            for name in move_names if counts["frames"]
+        )
+        print(f"Dancer #{track_id}: {counts['frames']} frames with a pose. {rates}")
+
+if __name__ == "__main__":
+    main()
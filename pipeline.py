@@ -0,0 +1,198 @@
+import queue
+import threading
+import time
+from collections import deque
+
+# Stages timed by the pipeline, in the order a frame passes through them
+STAGES = ("capture", "inference", "render", "end_to_end")
+
+
+def put_latest(q, item):
+    # Put into a bounded queue, dropping the oldest item instead of blocking.
+    # Returns the number of stale items that were thrown away.
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class PipelineStats:
+    # Live windowed averages for the UI; every sample is also forwarded to an
+    # optional profiling.StageProfiler for histograms and metrics export
+    def __init__(self, window=120, profiler=None):
+        self.profiler = profiler
+        self.lock = threading.Lock()
+        self.latencies = {stage: deque(maxlen=window) for stage in STAGES}
+        self.frame_times = deque(maxlen=window)
+        self.dropped = 0
+        self.frames = 0
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+        if self.profiler is not None:
+            self.profiler.observe(stage, seconds)
+
+    def drop(self, count=1):
+        if not count:
+            return
+        with self.lock:
+            self.dropped += count
+        if self.profiler is not None:
+            self.profiler.increment("dropped_frames", count)
+
+    def frame_done(self, captured_at):
+        now = time.perf_counter()
+        with self.lock:
+            self.latencies["end_to_end"].append(now - captured_at)
+            self.frame_times.append(now)
+            self.frames += 1
+        if self.profiler is not None:
+            self.profiler.observe("end_to_end", now - captured_at)
+            self.profiler.increment("frames")
+
+    def fps(self):
+        with self.lock:
+            if len(self.frame_times) < 2:
+                return 0.0
+            span = self.frame_times[-1] - self.frame_times[0]
+            return (len(self.frame_times) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        fps = self.fps()
+        with self.lock:
+            latency_ms = {
+                stage: (sum(values) / len(values) * 1000 if values else 0.0)
+                for stage, values in self.latencies.items()
+            }
+            return {
+                "fps": fps,
+                "frames": self.frames,
+                "dropped": self.dropped,
+                "latency_ms": latency_ms,
+            }
+
+    def summary(self):
+        snap = self.snapshot()
+        stages = " | ".join(f"{stage}: {ms:.1f} ms" for stage, ms in snap["latency_ms"].items())
+        return f"FPS: {snap['fps']:.1f} (dropped {snap['dropped']})\n{stages}"
+
+
+class FramePipeline:
+    # Capture thread -> inference worker -> consumer (the caller's thread).
+    # Queues hold at most `queue_size` items. For a live source (camera,
+    # stream) they always keep the newest frame, so a slow stage never makes
+    # the feed go stale; for a file or stills (cap.live false) each stage
+    # waits for the next one instead, so every frame is scored.
+    def __init__(self, cap, process_fn, queue_size=1, profiler=None, frame_profiler=None):
+        self.cap = cap
+        self.live = getattr(cap, "live", True)
+        self.process_fn = process_fn
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue(maxsize=queue_size)
+        self.stats = PipelineStats(profiler=profiler)
+        self.frame_profiler = frame_profiler
+        self.stop_event = threading.Event()
+        self.error = None
+        self.threads = []
+
+    def start(self):
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        self.threads = []
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def frames(self, timeout=0.1, heartbeat=False):
+        # Yield (frame, result) on the calling thread; the time spent by the
+        # caller before asking for the next frame is recorded as "render".
+        # With heartbeat=True, (None, None) is yielded every `timeout` seconds
+        # without a result, so the caller is never stuck here.
+        while self.running or not self.result_queue.empty():
+            try:
+                item = self.result_queue.get(timeout=timeout)
+            except queue.Empty:
+                if heartbeat:
+                    yield None, None
+                continue
+            if item is None:
+                # End of the source, after every frame queued before it
+                self.stop_event.set()
+                break
+            captured_at, frame, result = item
+            if self.frame_profiler is not None:
+                self.frame_profiler.attach()
+            started = time.perf_counter()
+            yield frame, result
+            self.stats.record("render", time.perf_counter() - started)
+            self.stats.frame_done(captured_at)
+            if self.frame_profiler is not None:
+                self.frame_profiler.frame_done()
+
+    def _capture_loop(self):
+        while self.running:
+            if self.frame_profiler is not None:
+                self.frame_profiler.attach()
+            started = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                # Frame sources report their own failure and None for a clean
+                # end; the frames already queued are still processed
+                self.error = getattr(self.cap, "error", "Failed to capture video.")
+                self._put(self.frame_queue, None)
+                break
+            self.stats.record("capture", time.perf_counter() - started)
+            self._put(self.frame_queue, (started, frame))
+
+    def _put(self, q, item):
+        if self.live:
+            self.stats.drop(put_latest(q, item))
+            return
+        while self.running:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _inference_loop(self):
+        while self.running:
+            try:
+                item = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                self._put(self.result_queue, None)
+                break
+            captured_at, frame = item
+            if self.frame_profiler is not None:
+                self.frame_profiler.attach(primary=True)
+            started = time.perf_counter()
+            try:
+                result = self.process_fn(frame)
+            except Exception as e:
+                # End the pipeline with the reason instead of idling silently
+                self.error = f"Processing failed: {e}"
+                self.stop_event.set()
+                break
+            self.stats.record("inference", time.perf_counter() - started)
+            self._put(self.result_queue, (captured_at, frame, result))
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from startup import report, timed_import
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "first.jpg")
+
+# Model complexity tiers offered by MediaPipe Pose
+TIERS = {"lite": 0, "full": 1, "heavy": 2}
+TIER_NAMES = {complexity: tier for tier, complexity in TIERS.items()}
+
+def pose_solution():
+    # mediapipe takes most of a second to import, so it is only loaded when
+    # the first model is built
+    return timed_import("mediapipe").solutions.pose
+
+def pose_settings(tier="full", static_image_mode=False, min_detection_confidence=0.5,
+                  min_tracking_confidence=0.5, smooth_landmarks=True):
+    return {
+        "static_image_mode": static_image_mode,
+        "model_complexity": TIERS[tier],
+        "smooth_landmarks": smooth_landmarks,
+        "min_detection_confidence": min_detection_confidence,
+        "min_tracking_confidence": min_tracking_confidence,
+    }
+
+def sample_frames(count=3, size=(640, 480)):
+    cv2 = timed_import("cv2")
+    image = cv2.imread(SAMPLE_IMAGE)
+    if image is None:
+        image = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    image = cv2.cvtColor(cv2.resize(image, size), cv2.COLOR_BGR2RGB)
+    return [np.roll(image, index * 8, axis=1) for index in range(count)]
+
+def warm_up(pose, frames=None):
+    # Run a few inferences so graph setup and allocation happen before the first
+    # real frame, then clear the tracking state. Returns the median latency.
+    latencies = []
+    for frame in frames or sample_frames():
+        started = time.perf_counter()
+        pose.process(frame)
+        latencies.append(time.perf_counter() - started)
+    pose.reset()
+    return float(np.median(latencies))
+
+class PoseProvider:
+    # Process-wide pool of warmed Pose instances keyed by their settings. A Pose
+    # carries tracking state and is not thread-safe, so each session acquires
+    # its own instance and releases it when done; released instances are reset
+    # and handed to the next session (or Streamlit rerun) without rebuilding.
+    # At most max_idle instances are kept; beyond that the ones whose settings
+    # were used least recently are closed, so every slider position tried in
+    # the app does not keep its own model graph alive.
+    def __init__(self, max_idle=4):
+        self.lock = threading.Lock()
+        self.max_idle = max_idle
+        self.idle = OrderedDict()
+        self.owners = {}
+        self.latencies = {}
+
+    @staticmethod
+    def _key(settings):
+        return tuple(sorted(settings.items()))
+
+    def _build(self, settings, warm=True):
+        # The first build of each tier goes into the startup report
+        with report.time(f"model {TIER_NAMES[settings['model_complexity']]}"):
+            pose = pose_solution().Pose(**settings)
+            if warm:
+                warm_up(pose)
+        return pose
+
+    def _add_idle(self, key, pose):
+        # Park a pose and close the least recently used ones over max_idle
+        with self.lock:
+            self.idle.setdefault(key, []).append(pose)
+            self.idle.move_to_end(key)
+            evicted = []
+            while sum(len(poses) for poses in self.idle.values()) > self.max_idle:
+                oldest = next(iter(self.idle))
+                evicted.append(self.idle[oldest].pop(0))
+                if not self.idle[oldest]:
+                    del self.idle[oldest]
+        for old in evicted:
+            old.close()
+
+    def acquire(self, tier="full", warm=True, **options):
+        settings = pose_settings(tier, **options)
+        key = self._key(settings)
+        with self.lock:
+            idle = self.idle.get(key)
+            pose = idle.pop() if idle else None
+            if idle is not None and not idle:
+                del self.idle[key]
+        if pose is None:
+            pose = self._build(settings, warm)
+        with self.lock:
+            self.owners[id(pose)] = key
+        return pose
+
+    def release(self, pose):
+        with self.lock:
+            key = self.owners.pop(id(pose), None)
+        if key is None:
+            pose.close()
+            return
+        pose.reset()
+        self._add_idle(key, pose)
+
+    def prewarm(self, tier="full", count=1, **options):
+        # Build and warm instances ahead of the first session
+        settings = pose_settings(tier, **options)
+        key = self._key(settings)
+        with self.lock:
+            missing = count - len(self.idle.get(key, []))
+        for _ in range(missing):
+            self._add_idle(key, self._build(settings))
+
+    def tier_latency(self, tier):
+        # Median warm latency of a tier, measured once per process. None when
+        # the tier's model cannot be loaded (e.g. it is not downloaded yet).
+        if tier not in self.latencies:
+            try:
+                pose = pose_solution().Pose(**pose_settings(tier))
+            except Exception:
+                self.latencies[tier] = None
+            else:
+                warm_up(pose)
+                self.latencies[tier] = warm_up(pose, sample_frames(count=5))
+                pose.close()
+        return self.latencies[tier]
+
+    def select_tier(self, budget_ms):
+        # Heaviest tier whose measured latency fits the per-frame budget
+        fallback = None
+        for tier in ("heavy", "full", "lite"):
+            latency = self.tier_latency(tier)
+            if latency is None:
+                continue
+            fallback = tier
+            if latency * 1000 <= budget_ms:
+                return tier
+        return fallback or "full"
+
+provider = PoseProvider()
@@ -0,0 +1,233 @@
+import bisect
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Histogram:
+    # Fixed buckets, so observing a sample is a bisect and two additions
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th sample
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+class StageProfiler:
+    # Per-stage latency histograms and event counters for the main loop. A
+    # per-session profiler forwards every sample to its parent, so the live
+    # panel shows one session while the parent aggregates for export.
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+        if self.parent is not None:
+            self.parent.observe(stage, seconds)
+
+    def increment(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+        if self.parent is not None:
+            self.parent.increment(counter, amount)
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def to_json(self):
+        with self.lock:
+            return {
+                "timestamp": time.time(),
+                "uptime_s": time.time() - self.started,
+                "counters": dict(self.counters),
+                "stages": {
+                    stage: {
+                        "count": histogram.count,
+                        "mean_ms": histogram.mean() * 1000,
+                        "p50_ms": histogram.quantile(0.5) * 1000,
+                        "p95_ms": histogram.quantile(0.95) * 1000,
+                        "p99_ms": histogram.quantile(0.99) * 1000,
+                    }
+                    for stage, histogram in self.histograms.items()
+                },
+            }
+
+    def write_json_log(self, path):
+        # One JSON snapshot per line
+        with open(path, "a") as f:
+            f.write(json.dumps(self.to_json()) + "\n")
+
+    def prometheus_text(self, prefix="final_dance"):
+        lines = []
+        with self.lock:
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{counter}_total counter")
+                lines.append(f"{prefix}_{counter}_total {value}")
+            name = f"{prefix}_stage_latency_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def panel(self, fps):
+        # Compact text for the live performance panel
+        snapshot = self.to_json()
+        lines = [
+            f"FPS: {fps:.1f}",
+            f"Frames: {snapshot['counters'].get('frames', 0)}",
+            f"Dropped: {snapshot['counters'].get('dropped_frames', 0)}",
+            "Stage p50 / p95 ms:",
+        ]
+        for stage, summary in snapshot["stages"].items():
+            lines.append(f"  {stage}: {summary['p50_ms']:.1f} / {summary['p95_ms']:.1f}")
+        return "\n".join(lines)
+
+class FrameProfiler:
+    # Runs cProfile for the next N frames, then writes the stats to a file.
+    # cProfile only sees the thread that enabled it, so every pipeline thread
+    # calls attach() once per iteration; the dump merges all of them. From
+    # Python 3.12 cProfile sits on sys.monitoring, which takes one profiler
+    # per interpreter, so there only the thread attaching with primary=True
+    # is profiled: FramePipeline's inference stage, RingPipeline's consumer.
+    def __init__(self, frames, path="profile.pstats"):
+        self.remaining = frames
+        self.path = path
+        self.single = sys.version_info >= (3, 12)
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.unprofiled = set()
+        self.stopped = set()
+        self.finished = frames <= 0
+        self.dumped = self.finished
+        # Whether a profile file was written; False when no frame was profiled
+        self.written = False
+
+    def attach(self, primary=False):
+        if self.dumped:
+            return
+        ident = threading.get_ident()
+        with self.lock:
+            profile = self.profiles.get(ident)
+            if not self.finished:
+                if profile is None and ident not in self.unprofiled and (primary or not self.single):
+                    profile = cProfile.Profile()
+                    try:
+                        profile.enable()
+                    except ValueError:
+                        # Another profiler is already active in this interpreter
+                        self.unprofiled.add(ident)
+                        return
+                    self.profiles[ident] = profile
+                return
+            if profile is not None and ident not in self.stopped:
+                profile.disable()
+                self.stopped.add(ident)
+            if len(self.stopped) == len(self.profiles):
+                self._dump()
+
+    def frame_done(self):
+        if self.dumped:
+            return
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self.finished = True
+        self.attach()
+
+    def close(self):
+        # Dump whatever was collected, including threads that already exited
+        # and so never got to detach themselves
+        with self.lock:
+            self.finished = True
+        self.attach()
+        with self.lock:
+            if not self.dumped:
+                self.stopped.update(self.profiles)
+                self._dump()
+
+    def _dump(self):
+        profiles = [self.profiles[ident] for ident in self.stopped]
+        self.dumped = True
+        if not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(self.path)
+        self.written = True
+        with open(self.path + ".txt", "w") as f:
+            stats.stream = f
+            stats.sort_stats("cumulative").print_stats(40)
+
+def serve_metrics(profiler, port, host="127.0.0.1"):
+    # Prometheus-style text on /metrics and the JSON snapshot on /metrics.json
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = profiler.prometheus_text().encode()
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body = json.dumps(profiler.to_json()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
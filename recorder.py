@@ -0,0 +1,229 @@
+import argparse
+import json
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS
+from moves import DANCES, MOVES, moves_for_dances, score_batch
+
+# File layout: MAGIC, a little-endian uint32 header length, a JSON header
+# padded to 4 bytes, then chunks. Each chunk is a 16-byte header (CHUNK_MAGIC,
+# frames, codec, payload bytes) and a payload of frames fixed-size float32
+# records: [timestamp, moving, inferred, 33 * 4 landmarks, one score per move].
+# Frames without a pose store NaN landmarks and scores.
+MAGIC = b"FDLOG001"
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sIII")
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+
+TIMESTAMP = 0
+MOVING = 1
+INFERRED = 2
+LANDMARKS_START = 3
+SCORES_START = LANDMARKS_START + NUM_LANDMARKS * 4
+
+def record_size(move_names):
+    return SCORES_START + len(move_names)
+
+class SessionRecorder:
+    # Append-only session log. record() only copies one row into the current
+    # chunk buffer; full chunks are compressed and written by a background
+    # thread, so the capture loop never waits on the disk.
+    def __init__(self, path, move_names, fps=None, chunk_frames=256, compress=False):
+        self.path = path
+        self.move_names = list(move_names)
+        self.fps = fps
+        self.chunk_frames = chunk_frames
+        self.compress = compress
+        self.buffer = self._new_buffer()
+        self.count = 0
+        self.frames = 0
+        self.started_at = None
+        self.file = None
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, name="session-recorder", daemon=True)
+
+    def _new_buffer(self):
+        return np.empty((self.chunk_frames, record_size(self.move_names)), dtype=np.float32)
+
+    def start(self):
+        header = json.dumps({
+            "moves": self.move_names,
+            "fps": self.fps,
+            "record_size": record_size(self.move_names),
+            "num_landmarks": NUM_LANDMARKS,
+            "created": time.time(),
+        }).encode()
+        header += b" " * (-len(header) % 4)
+        self.file = open(self.path, "wb")
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.started_at = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def record(self, landmarks, scores=None, moving=False, inferred=True, timestamp=None):
+        if timestamp is None:
+            timestamp = time.perf_counter() - self.started_at
+        row = self.buffer[self.count]
+        row[TIMESTAMP] = timestamp
+        row[MOVING] = moving
+        row[INFERRED] = inferred
+        if landmarks is None:
+            row[LANDMARKS_START:] = np.nan
+        else:
+            row[LANDMARKS_START:SCORES_START] = np.asarray(landmarks).reshape(-1)
+            if scores is None:
+                row[SCORES_START:] = np.nan
+            else:
+                row[SCORES_START:] = [scores[name] for name in self.move_names]
+        self.count += 1
+        self.frames += 1
+        if self.count == self.chunk_frames:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if self.count:
+            # Hand the filled buffer over instead of copying it
+            self.queue.put(self.buffer[:self.count])
+            self.buffer = self._new_buffer()
+            self.count = 0
+
+    def _write_loop(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                payload = chunk.tobytes()
+                codec = CODEC_RAW
+                if self.compress:
+                    payload = zlib.compress(payload, 1)
+                    codec = CODEC_ZLIB
+                    payload += b"\0" * (-len(payload) % 4)
+                self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(chunk), codec, len(payload)))
+                self.file.write(payload)
+                self.file.flush()
+            except OSError as e:
+                self.error = f"Session log write failed: {e}"
+
+    def close(self):
+        if self.file is None:
+            return
+        self._flush_chunk()
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        self.file = None
+
+class SessionReader:
+    # Memory-mapped reader for a session log. Raw chunks are returned as views
+    # into the mapping; compressed chunks are inflated on access. A truncated
+    # last chunk (e.g. after a crash) is ignored.
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a session log")
+        header_start = len(MAGIC) + 4
+        (header_length,) = struct.unpack("<I", bytes(self.data[len(MAGIC):header_start]))
+        self.header = json.loads(bytes(self.data[header_start:header_start + header_length]))
+        self.move_names = self.header["moves"]
+        self.fps = self.header["fps"]
+        self.record_size = self.header["record_size"]
+        self.chunks = self._index(header_start + header_length)
+        self.frames = sum(frames for _, frames, _, _ in self.chunks)
+
+    def _index(self, offset):
+        chunks = []
+        while offset + CHUNK_HEADER.size <= len(self.data):
+            magic, frames, codec, size = CHUNK_HEADER.unpack(bytes(self.data[offset:offset + CHUNK_HEADER.size]))
+            offset += CHUNK_HEADER.size
+            if magic != CHUNK_MAGIC or offset + size > len(self.data):
+                break
+            chunks.append((offset, frames, codec, size))
+            offset += size
+        return chunks
+
+    def __len__(self):
+        return self.frames
+
+    def chunk(self, index):
+        offset, frames, codec, size = self.chunks[index]
+        payload = self.data[offset:offset + size]
+        if codec == CODEC_ZLIB:
+            payload = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+        return payload[:frames * self.record_size * 4].view(np.float32).reshape(frames, self.record_size)
+
+    def iter_chunks(self):
+        for index in range(len(self.chunks)):
+            yield self.chunk(index)
+
+    def records(self):
+        if not self.chunks:
+            return np.empty((0, self.record_size), dtype=np.float32)
+        return np.concatenate(list(self.iter_chunks()))
+
+    def landmarks(self, records=None):
+        records = self.records() if records is None else records
+        return records[:, LANDMARKS_START:SCORES_START].reshape(-1, NUM_LANDMARKS, 4)
+
+    def scores(self, records=None):
+        # Recorded live scores: move name -> (N,) float32, NaN when no pose
+        records = self.records() if records is None else records
+        return {name: records[:, SCORES_START + index] for index, name in enumerate(self.move_names)}
+
+    def iter_frames(self):
+        # (timestamp, moving, (33, 4) landmarks or None) per frame, for feeding
+        # the per-frame check_* scorers
+        for chunk in self.iter_chunks():
+            for row in chunk:
+                landmarks = row[LANDMARKS_START:SCORES_START].reshape(NUM_LANDMARKS, 4)
+                if np.isnan(landmarks[0, 0]):
+                    landmarks = None
+                yield float(row[TIMESTAMP]), bool(row[MOVING]), landmarks
+
+    def replay(self, move_names=None):
+        # Re-score the whole session in one vectorized pass. As in the live
+        # engine, only frames with a pose reach the scorers (and the temporal
+        # trackers' history); the others score 0.
+        landmarks = self.landmarks()
+        detected = ~np.isnan(landmarks[:, 0, 0])
+        scores = {}
+        for name, values in score_batch(landmarks[detected], move_names or self.move_names).items():
+            scores[name] = np.zeros(len(landmarks), dtype=np.int8)
+            scores[name][detected] = values
+        return scores, detected
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded dance session and re-score it.")
+    parser.add_argument("log", help="Session log written by SessionRecorder")
+    parser.add_argument("--dance", action="append", choices=sorted(DANCES),
+                        help="Score these dances instead of the recorded moves (repeatable)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    reader = SessionReader(args.log)
+    move_names = moves_for_dances(args.dance) if args.dance else reader.move_names
+    started = time.perf_counter()
+    scores, detected = reader.replay(move_names)
+    elapsed = time.perf_counter() - started
+    records = reader.records()
+    duration = float(records[-1, TIMESTAMP]) if len(records) else 0.0
+    print(f"{len(reader)} frames ({duration:.1f} s recorded, pose in {detected.mean() * 100 if len(reader) else 0:.0f}%) "
+          f"replayed in {elapsed * 1000:.0f} ms")
+    for name in move_names:
+        hit_rate = scores[name][detected].mean() * 100 if detected.any() else 0.0
+        print(f"{MOVES[name]['label']}: {hit_rate:.0f}% of frames with a pose")
+
+if __name__ == "__main__":
+    main()
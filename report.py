@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+
+from moves import MOVES
+
+NO_POSE_TEXT = "No movements detected."
+
+class MoveStats:
+    # Running aggregates for one move; the rolling window is a ring of hits
+    # with a running sum, so each update is O(1)
+    def __init__(self, window):
+        self.window = np.zeros(window, dtype=np.int8)
+        self.window_sum = 0
+        self.frames = 0
+        self.hits = 0
+        self.streak = 0
+        self.best_streak = 0
+        self.feedback = {}
+
+    def update(self, hit, feedback):
+        slot = self.frames % len(self.window)
+        self.window_sum += hit - self.window[slot]
+        self.window[slot] = hit
+        self.frames += 1
+        self.hits += hit
+        self.streak = self.streak + 1 if hit else 0
+        self.best_streak = max(self.best_streak, self.streak)
+        self.feedback[bool(hit)] = feedback
+
+    def rolling_rate(self):
+        filled = min(self.frames, len(self.window))
+        return self.window_sum / filled if filled else 0.0
+
+    def session_rate(self):
+        return self.hits / self.frames if self.frames else 0.0
+
+class ReportModel:
+    # Session-level report. Moves are judged on their rolling hit rate rather
+    # than the last frame, and the text is only handed to the UI when it
+    # changed and at most once per min_interval seconds.
+    def __init__(self, move_names, window=90, min_interval=0.5, missing_after=15):
+        self.move_names = list(move_names)
+        self.window = window
+        self.min_interval = min_interval
+        self.missing_after = missing_after
+        self.stats = {name: MoveStats(window) for name in self.move_names}
+        self.motion_feedback = ""
+        self.detected = False
+        self.missing_frames = 0
+        self.last_text = None
+        self.last_push = None
+
+    def update(self, scores, feedback, motion_feedback):
+        for name in self.move_names:
+            self.stats[name].update(int(scores[name]), feedback[name])
+        self.motion_feedback = motion_feedback
+        self.detected = True
+        self.missing_frames = 0
+
+    def mark_missing(self):
+        # A few dropped detections do not wipe the report
+        self.missing_frames += 1
+        if self.missing_frames >= self.missing_after:
+            self.detected = False
+
+    def rolling_score(self):
+        if not self.move_names:
+            return 0.0
+        return sum(self.stats[name].rolling_rate() for name in self.move_names) / len(self.move_names) * 100
+
+    def session_score(self):
+        if not self.move_names:
+            return 0.0
+        return sum(self.stats[name].session_rate() for name in self.move_names) / len(self.move_names) * 100
+
+    def render(self):
+        if not self.detected:
+            return NO_POSE_TEXT
+        lines = ["Movement Report:"]
+        for name in self.move_names:
+            stats = self.stats[name]
+            good = stats.rolling_rate() >= 0.5
+            lines.append(
+                f"{MOVES[name]['label']}: {'Good' if good else 'Needs Improvement'} "
+                f"({stats.session_rate() * 100:.0f}% of frames, streak {stats.streak}, best {stats.best_streak})"
+            )
+        lines.append(f"Overall Score: {self.rolling_score():.0f}% (last {self.window} frames)")
+        lines.append(f"Session Score: {self.session_score():.0f}%")
+        lines.append("Specific Suggestions:")
+        for name in self.move_names:
+            stats = self.stats[name]
+            good = stats.rolling_rate() >= 0.5
+            feedback = stats.feedback.get(good) or stats.feedback.get(not good, "")
+            lines.append(f"- {MOVES[name]['label']}: {feedback}")
+        lines.append(f"- Motion: {self.motion_feedback}")
+        return "\n".join(lines)
+
+    def poll(self, now=None, force=False):
+        # The report text when the UI should be updated, otherwise None;
+        # force=True skips the rate limit, for the final report of a session
+        now = time.perf_counter() if now is None else now
+        if not force and self.last_push is not None and now - self.last_push < self.min_interval:
+            return None
+        text = self.render()
+        if text == self.last_text:
+            return None
+        self.last_text = text
+        self.last_push = now
+        return text
@@ -0,0 +1,77 @@
+import cv2
+
+from landmarks import X, Y, Z, landmark_bbox
+
+class RoiTracker:
+    # Crops each frame around the dancer found in the previous frame and
+    # downscales the crop to at most max_side pixels, so cvtColor and
+    # pose.process() cost about the same at 720p, 1080p or 4K. When the pose is
+    # lost the next frame is searched in full, downscaled to search_side, which
+    # is kept larger because detection recall drops faster than tracking's.
+    def __init__(self, max_side=640, search_side=1280, margin=0.25, min_size=0.2,
+                 min_visibility=0.5, smoothing=0.5):
+        self.max_side = max_side
+        self.search_side = search_side
+        self.margin = margin
+        self.min_size = min_size
+        self.min_visibility = min_visibility
+        self.smoothing = smoothing
+        self.roi = None
+
+    @property
+    def tracking(self):
+        return self.roi is not None
+
+    def reset(self):
+        self.roi = None
+
+    def prepare(self, frame):
+        # BGR frame -> (RGB model input, crop box in full-frame pixels)
+        height, width = frame.shape[:2]
+        if self.roi is None:
+            x0, y0, x1, y1 = 0, 0, width, height
+            max_side = self.search_side
+        else:
+            max_side = self.max_side
+            x0 = max(0, int(self.roi[0] * width))
+            y0 = max(0, int(self.roi[1] * height))
+            x1 = min(width, int(self.roi[2] * width) + 1)
+            y1 = min(height, int(self.roi[3] * height) + 1)
+        crop = frame[y0:y1, x0:x1]
+        crop_height, crop_width = crop.shape[:2]
+        scale = max_side / max(crop_height, crop_width)
+        if scale < 1:
+            size = (max(1, round(crop_width * scale)), max(1, round(crop_height * scale)))
+            crop = cv2.resize(crop, size, interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB), (x0, y0, crop_width, crop_height)
+
+    def map_back(self, landmarks, box, frame_shape):
+        # Landmarks normalized to the crop -> normalized to the full frame
+        height, width = frame_shape[:2]
+        x0, y0, crop_width, crop_height = box
+        mapped = landmarks.copy()
+        mapped[:, X] = (x0 + landmarks[:, X] * crop_width) / width
+        mapped[:, Y] = (y0 + landmarks[:, Y] * crop_height) / height
+        # z shares the x scale in MediaPipe's normalized coordinates
+        mapped[:, Z] = landmarks[:, Z] * crop_width / width
+        return mapped
+
+    def update(self, landmarks):
+        # Next crop from full-frame landmarks; None (or no visible joints) means lost
+        box = landmark_bbox(landmarks, self.margin, self.min_visibility)
+        if box is None:
+            self.roi = None
+            return
+        x0, y0, x1, y1 = box
+        # Keep a minimum size so a partial detection does not shrink the crop to nothing
+        center_x, center_y = (x0 + x1) / 2, (y0 + y1) / 2
+        half_w = max(x1 - x0, self.min_size) / 2
+        half_h = max(y1 - y0, self.min_size) / 2
+        box = (
+            max(0.0, center_x - half_w), max(0.0, center_y - half_h),
+            min(1.0, center_x + half_w), min(1.0, center_y + half_h),
+        )
+        if self.roi is not None:
+            # Smooth the box so the crop does not jitter with the landmarks
+            box = tuple(old + self.smoothing * (new - old) for old, new in zip(self.roi, box))
+        self.roi = box
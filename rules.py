@@ -0,0 +1,256 @@
+import json
+
+import numpy as np
+
+import landmarks as landmark_names
+from landmarks import VISIBILITY, X, Y, Z
+
+# Declarative move rules. A rule file (JSON, or YAML when PyYAML is installed)
+# has a "moves" table and an optional "dances" table:
+#
+#   "moves": {
+#     "posture": {
+#       "label": "Posture",
+#       "when": [{"lhs": "LEFT_SHOULDER.y", "op": "<", "rhs": "RIGHT_SHOULDER.y"}],
+#       "feedback": ["miss line", "hit line"]
+#     }
+#   },
+#   "dances": {"two_step": {"label": "Two Step", "moves": ["posture", ...]}}
+#
+# "when" is a list of comparisons that must all hold (code 1). Instead, "cases"
+# is a list of such lists; the first case that holds gives codes 1, 2, ... and
+# feedback needs one line per case after the miss line. Operands are numbers,
+# "JOINT.axis" strings (axis x, y, z or visibility) or expressions:
+#   {"abs": e}, {"sub": [a, b]}, {"add": [a, b]}
+#   {"distance": ["JOINT", "JOINT"]}          2D distance in normalized units
+#   {"angle": ["JOINT", "JOINT", "JOINT"]}    2D angle at the middle joint, degrees
+#   {"delta": e, "frames": k}                 e now minus e k frames earlier
+#   {"mean": e, "frames": k}                  mean of e over the last k frames
+# delta and mean read earlier frames, so they only hit when enough history is
+# passed in (see RulePlan.window); missing or NaN values never hit.
+# A top-level or per-move "min_visibility" makes every case also require each
+# joint it reads to be at least that visible, so occluded joints score a miss.
+
+AXES = {"x": X, "y": Y, "z": Z, "visibility": VISIBILITY}
+JOINTS = {
+    name: value for name, value in vars(landmark_names).items()
+    if name.isupper() and isinstance(value, int) and name not in ("NUM_LANDMARKS", "X", "Y", "Z", "VISIBILITY")
+}
+JOINT_NAMES = {value: name for name, value in JOINTS.items()}
+OPS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal}
+
+def load_spec(path):
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(f"{path}: YAML rule files need PyYAML installed.")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+def joint(name):
+    if name not in JOINTS:
+        raise ValueError(f"Unknown landmark {name!r}")
+    return JOINTS[name]
+
+def shift(values, frames):
+    # values[t - frames] along the frame axis, NaN where there is no such frame
+    shifted = np.full_like(values, np.nan)
+    if frames < values.shape[-1]:
+        shifted[..., frames:] = values[..., :values.shape[-1] - frames]
+    return shifted
+
+class RulePlan:
+    # Compiles the moves of a rule file into one evaluation plan. Every distinct
+    # operand becomes one row of a feature matrix and every distinct comparison
+    # one row of a condition matrix, so shared landmarks, angles and tests are
+    # computed once however many moves use them. Joint coordinates are gathered
+    # in a single fancy-index, comparisons run once per operator, and cases are
+    # matched with a few whole-matrix ANDs.
+    def __init__(self, moves, min_visibility=None):
+        self.features = []
+        self.feature_ids = {}
+        self.feature_joints = []
+        self.conditions = []
+        self.condition_ids = {}
+        self.case_conditions = []
+        self.move_cases = {}
+        self.window = 1
+        for name, move in moves.items():
+            if ("when" in move) == ("cases" in move):
+                raise ValueError(f"Move {name!r} needs exactly one of 'when' or 'cases'")
+            cases = move["cases"] if "cases" in move else [move["when"]]
+            if "feedback" in move and len(move["feedback"]) != len(cases) + 1:
+                raise ValueError(f"Move {name!r} needs {len(cases) + 1} feedback lines")
+            first = len(self.case_conditions)
+            threshold = move.get("min_visibility", min_visibility)
+            for case in cases:
+                if not case:
+                    raise ValueError(f"Move {name!r} has a case without conditions")
+                conditions = {self._condition(condition) for condition in case}
+                if threshold is not None:
+                    joints = set()
+                    for lhs, _, rhs in (self.conditions[index] for index in conditions):
+                        joints |= self.feature_joints[lhs] | self.feature_joints[rhs]
+                    conditions |= {
+                        self._condition({"lhs": f"{JOINT_NAMES[index]}.visibility", "op": ">=", "rhs": threshold})
+                        for index in joints
+                    }
+                self.case_conditions.append(sorted(conditions))
+            self.move_cases[name] = (first, len(self.case_conditions))
+        self.names = list(self.move_cases)
+        self._build()
+
+    def _feature(self, expr):
+        key = json.dumps(expr, sort_keys=True)
+        if key in self.feature_ids:
+            return self.feature_ids[key]
+        if isinstance(expr, (int, float)):
+            feature = ("const", float(expr))
+        elif isinstance(expr, str):
+            name, _, axis = expr.partition(".")
+            if axis not in AXES:
+                raise ValueError(f"Bad landmark coordinate {expr!r}, expected JOINT.x/y/z/visibility")
+            feature = ("coord", joint(name), AXES[axis])
+        elif isinstance(expr, dict) and "abs" in expr:
+            feature = ("abs", self._feature(expr["abs"]))
+        elif isinstance(expr, dict) and "sub" in expr:
+            feature = ("sub", self._feature(expr["sub"][0]), self._feature(expr["sub"][1]))
+        elif isinstance(expr, dict) and "add" in expr:
+            feature = ("add", self._feature(expr["add"][0]), self._feature(expr["add"][1]))
+        elif isinstance(expr, dict) and "distance" in expr:
+            a, b = expr["distance"]
+            feature = ("distance",) + tuple(self._feature(f"{name}.{axis}") for name in (a, b) for axis in "xy")
+        elif isinstance(expr, dict) and "angle" in expr:
+            feature = ("angle",) + tuple(self._feature(f"{name}.{axis}") for name in expr["angle"] for axis in "xy")
+        elif isinstance(expr, dict) and ("delta" in expr or "mean" in expr):
+            kind = "delta" if "delta" in expr else "mean"
+            frames = int(expr.get("frames", 1))
+            if frames < 1:
+                raise ValueError(f"{kind} needs frames >= 1")
+            self.window = max(self.window, frames + 1 if kind == "delta" else frames)
+            feature = (kind, self._feature(expr[kind]), frames)
+        else:
+            raise ValueError(f"Cannot compile rule operand {expr!r}")
+        # Operands are registered after their inputs, so rows are in evaluation order
+        if feature[0] == "coord":
+            joints = frozenset([feature[1]])
+        elif feature[0] == "const":
+            joints = frozenset()
+        else:
+            inputs = feature[1:2] if feature[0] in ("delta", "mean") else feature[1:]
+            joints = frozenset().union(*(self.feature_joints[row] for row in inputs))
+        self.feature_ids[key] = len(self.features)
+        self.features.append(feature)
+        self.feature_joints.append(joints)
+        return self.feature_ids[key]
+
+    def _condition(self, condition):
+        op = condition["op"]
+        if op not in OPS:
+            raise ValueError(f"Unknown comparison {op!r}, expected one of {', '.join(OPS)}")
+        key = (self._feature(condition["lhs"]), op, self._feature(condition["rhs"]))
+        if key not in self.condition_ids:
+            self.condition_ids[key] = len(self.conditions)
+            self.conditions.append(key)
+        return self.condition_ids[key]
+
+    def _build(self):
+        coords = [(row, feature) for row, feature in enumerate(self.features) if feature[0] == "coord"]
+        self.coord_rows = np.array([row for row, _ in coords], dtype=np.intp)
+        self.coord_joints = np.array([feature[1] for _, feature in coords], dtype=np.intp)
+        self.coord_axes = np.array([feature[2] for _, feature in coords], dtype=np.intp)
+        consts = [(row, feature[1]) for row, feature in enumerate(self.features) if feature[0] == "const"]
+        self.const_rows = np.array([row for row, _ in consts], dtype=np.intp)
+        self.const_values = np.array([value for _, value in consts], dtype=np.float32)[:, None]
+        self.derived = [(row, feature) for row, feature in enumerate(self.features)
+                        if feature[0] not in ("coord", "const")]
+        self.op_groups = []
+        for op in OPS:
+            rows = [row for row, condition in enumerate(self.conditions) if condition[1] == op]
+            if rows:
+                self.op_groups.append((
+                    OPS[op],
+                    np.array(rows, dtype=np.intp),
+                    np.array([self.conditions[row][0] for row in rows], dtype=np.intp),
+                    np.array([self.conditions[row][2] for row in rows], dtype=np.intp),
+                ))
+        # Column j holds each case's j-th condition, padded with its first one
+        # (AND is idempotent), so a case holds when all of its columns do
+        width = max([len(conditions) for conditions in self.case_conditions], default=0)
+        self.case_columns = [
+            np.array([conditions[min(column, len(conditions) - 1)] for conditions in self.case_conditions],
+                     dtype=np.intp)
+            for column in range(width)
+        ]
+        # A move's first case gives code 1 and wins over later ones, so codes
+        # start as the first cases' hits and later cases only fill the misses
+        spans = list(self.move_cases.values())
+        self.first_cases = np.array([first for first, _ in spans], dtype=np.intp)
+        self.later_cases = []
+        for code in range(2, max([last - first for first, last in spans], default=0) + 1):
+            rows = [(row, first + code - 1) for row, (first, last) in enumerate(spans) if last - first >= code]
+            self.later_cases.append((
+                np.int8(code),
+                np.array([row for row, _ in rows], dtype=np.intp),
+                np.array([case for _, case in rows], dtype=np.intp),
+            ))
+
+    def _derive(self, values, feature):
+        kind = feature[0]
+        if kind == "abs":
+            return np.abs(values[feature[1]])
+        if kind == "sub":
+            return values[feature[1]] - values[feature[2]]
+        if kind == "add":
+            return values[feature[1]] + values[feature[2]]
+        if kind == "distance":
+            ax, ay, bx, by = (values[row] for row in feature[1:])
+            return np.hypot(ax - bx, ay - by)
+        if kind == "angle":
+            ax, ay, bx, by, cx, cy = (values[row] for row in feature[1:])
+            first = np.arctan2(ay - by, ax - bx)
+            second = np.arctan2(cy - by, cx - bx)
+            angle = np.abs(np.degrees(first - second)) % 360
+            return np.minimum(angle, 360 - angle)
+        source, frames = values[feature[1]], feature[2]
+        if kind == "delta":
+            return source - shift(source, frames)
+        # Rolling mean from running sums; NaN until the window is full and for
+        # windows holding a frame without a pose. Gaps are summed as zero and
+        # counted separately, so one missing frame cannot poison later windows.
+        missing = np.isnan(source)
+        total = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, source), dtype=np.float64)))
+        gaps = np.concatenate(([0], np.cumsum(missing)))
+        mean = np.full_like(source, np.nan)
+        if frames <= len(source):
+            window_total = total[frames:] - total[:-frames]
+            window_gaps = gaps[frames:] - gaps[:-frames]
+            mean[frames - 1:] = np.where(window_gaps > 0, np.nan, window_total / frames)
+        return mean
+
+    def evaluate(self, landmarks):
+        # (33, 4) -> name -> int code; (N, 33, 4) frames in time order -> name -> (N,) int8 codes
+        single = landmarks.ndim == 2
+        batch = landmarks[None] if single else landmarks
+        values = np.empty((len(self.features), len(batch)), dtype=np.float32)
+        values[self.coord_rows] = batch[:, self.coord_joints, self.coord_axes].T
+        values[self.const_rows] = self.const_values
+        for row, feature in self.derived:
+            values[row] = self._derive(values, feature)
+        conditions = np.empty((len(self.conditions), len(batch)), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for op, rows, lhs, rhs in self.op_groups:
+                conditions[rows] = op(values[lhs], values[rhs])
+        hits = conditions[self.case_columns[0]]
+        for column in self.case_columns[1:]:
+            hits &= conditions[column]
+        codes = hits[self.first_cases].view(np.int8)
+        for code, move_rows, case_rows in self.later_cases:
+            rows = codes[move_rows]
+            rows[(rows == 0) & hits[case_rows]] = code
+            codes[move_rows] = rows
+        if single:
+            return dict(zip(self.names, codes[:, 0].tolist()))
+        return dict(zip(self.names, codes))
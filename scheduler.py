@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+
+# always: pose on every frame
+# motion: skip pose while the scene is still, refreshing every idle_interval frames
+# adaptive: motion gating plus an inference rate lowered to fit the latency budget
+MODES = ("always", "motion", "adaptive")
+
+class InferenceScheduler:
+    def __init__(self, mode="always", idle_interval=15, budget_ms=33.0, max_interval=6, smoothing=0.2):
+        if mode not in MODES:
+            raise ValueError(f"Unknown inference mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.idle_interval = idle_interval
+        self.budget = budget_ms / 1000
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.interval = 1
+        self.latency = None
+        self.frames_since_inference = math.inf
+        self.skipped = 0
+
+    def should_infer(self, moving):
+        self.frames_since_inference += 1
+        if self.mode == "always":
+            run = True
+        elif not moving:
+            run = self.frames_since_inference >= self.idle_interval
+        else:
+            run = self.frames_since_inference >= self.interval
+        if run:
+            self.frames_since_inference = 0
+        else:
+            self.skipped += 1
+        return run
+
+    def record_latency(self, seconds):
+        # Exponential moving average of the pose latency drives the adaptive rate
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.smoothing * (seconds - self.latency)
+        if self.mode == "adaptive":
+            self.interval = min(self.max_interval, max(1, math.ceil(self.latency / self.budget)))
+
+class LandmarkExtrapolator:
+    # Fills frames without inference from the last two inferred landmark arrays,
+    # extrapolating linearly for at most max_frames before holding the last pose.
+    def __init__(self, max_frames=3):
+        self.max_frames = max_frames
+        self.previous = None
+        self.previous_index = None
+        self.last = None
+        self.last_index = None
+
+    def reset(self):
+        self.previous = self.last = None
+
+    def update(self, index, landmarks):
+        if landmarks is None:
+            self.reset()
+            return
+        self.previous, self.previous_index = self.last, self.last_index
+        self.last, self.last_index = landmarks, index
+
+    def predict(self, index):
+        if self.last is None:
+            return None
+        if self.previous is None:
+            return self.last.copy()
+        step = min(index - self.last_index, self.max_frames)
+        velocity = (self.last - self.previous) / (self.last_index - self.previous_index)
+        predicted = self.last + velocity * step
+        # Visibility is not extrapolated
+        predicted[:, 3] = self.last[:, 3]
+        return predicted.astype(np.float32, copy=False)
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from engine import MoveScorer
+from landmarks import NUM_LANDMARKS, empty_landmarks, landmarks_to_array
+from moves import DANCES, MOVES, batchable, code_batch, moves_for_dances
+from pose_provider import TIERS, provider
+
+try:
+    from aiohttp import WSMsgType, web
+except ImportError:
+    web = None
+
+# Endpoints (moves are picked with ?dance=a,b or ?moves=x,y, default all):
+#   GET  /health            queue and batching counters
+#   GET  /moves             dances and move labels
+#   POST /score/landmarks   JSON {"landmarks": (33, 4) or (N, 33, 4) list}
+#   POST /score/frame       one JPEG/PNG image as the request body
+#   GET  /ws                WebSocket: binary messages are images, text
+#                           messages are {"landmarks": ...}; one reply each
+# Replies are {"frames": [{"detected", "scores", "feedback", "landmarks"}]}.
+# A WebSocket keeps temporal move state across messages; a POST scores its
+# frames as one short sequence.
+
+class Overloaded(Exception):
+    pass
+
+class ScoringService:
+    # Shared by every client: a bounded pool of pose workers for images and a
+    # batcher that scores the per-frame moves of all clients' frames in one
+    # vectorized call. Frames wait at most max_wait seconds for a batch.
+    def __init__(self, workers=2, tier="full", max_batch=256, max_wait=0.005, max_pending=32):
+        self.workers = workers
+        self.tier = tier
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="pose-worker")
+        self.local = threading.local()
+        self.poses = []
+        self.poses_lock = threading.Lock()
+        self.pending = 0
+        self.queue = None
+        self.task = None
+        self.batches = 0
+        self.batched_frames = 0
+
+    async def start(self, app=None):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._batch_loop())
+
+    async def stop(self, app=None):
+        self.task.cancel()
+        self.executor.shutdown(wait=True)
+        for pose in self.poses:
+            provider.release(pose)
+
+    def _pose(self):
+        # Static-image mode: worker threads serve frames from unrelated clients
+        pose = getattr(self.local, "pose", None)
+        if pose is None:
+            pose = provider.acquire(self.tier, static_image_mode=True)
+            self.local.pose = pose
+            with self.poses_lock:
+                self.poses.append(pose)
+        return pose
+
+    def _infer(self, data):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Body is not a decodable image")
+        results = self._pose().process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        if not results.pose_landmarks:
+            return empty_landmarks()
+        return landmarks_to_array(results.pose_landmarks.landmark)
+
+    async def infer(self, data):
+        # (33, 4) landmarks of an encoded image, NaN when no pose was found
+        if self.pending >= self.max_pending:
+            raise Overloaded()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._infer, data)
+        finally:
+            self.pending -= 1
+
+    async def score(self, frames, move_names):
+        # (N, 33, 4) -> name -> (N,) codes for batchable moves
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((frames, move_names, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            names = list(dict.fromkeys(name for _, move_names, _ in batch for name in move_names))
+            try:
+                codes = code_batch(np.concatenate([frames for frames, _, _ in batch]), names)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_frames += size
+            offset = 0
+            for frames, move_names, future in batch:
+                if not future.done():
+                    future.set_result({name: codes[name][offset:offset + len(frames)] for name in move_names})
+                offset += len(frames)
+
+class ClientSession:
+    # One client's moves: per-frame moves go through the shared batcher,
+    # temporal ones through a MoveScorer that keeps this client's history
+    def __init__(self, service, move_names):
+        self.service = service
+        self.move_names = list(move_names)
+        self.batched = [name for name in self.move_names if batchable(name)]
+        self.scorer = MoveScorer([name for name in self.move_names if not batchable(name)])
+
+    async def score(self, frames, include_landmarks=False):
+        detected = ~np.isnan(frames[:, 0, 0])
+        codes = {}
+        if self.batched and detected.any():
+            codes = await self.service.score(frames[detected], self.batched)
+        results = []
+        row = 0
+        for index, landmarks in enumerate(frames):
+            if not detected[index]:
+                results.append({"detected": False})
+                continue
+            frame_codes = {name: int(codes[name][row]) for name in self.batched}
+            frame_codes.update(self.scorer.update(landmarks))
+            row += 1
+            result = {
+                "detected": True,
+                "scores": {name: int(frame_codes[name] > 0) for name in self.move_names},
+                "feedback": {name: MOVES[name]["feedback"][frame_codes[name]] for name in self.move_names},
+            }
+            if include_landmarks:
+                result["landmarks"] = landmarks.tolist()
+            results.append(result)
+        return results
+
+def parse_moves(query):
+    # ?dance=a,b and/or ?moves=x,y; everything when neither is given
+    dances = [name for value in query.getall("dance", []) for name in value.split(",") if name]
+    names = [name for value in query.getall("moves", []) for name in value.split(",") if name]
+    unknown = [name for name in dances if name not in DANCES] + [name for name in names if name not in MOVES]
+    if unknown:
+        raise web.HTTPBadRequest(text=f"Unknown dance or move: {', '.join(unknown)}")
+    if not dances and not names:
+        return list(MOVES)
+    return list(dict.fromkeys(moves_for_dances(dances) + names))
+
+def parse_landmarks(payload):
+    try:
+        frames = np.asarray(payload["landmarks"], dtype=np.float32)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Expected {"landmarks": [[x, y, z, visibility], ...]}')
+    if frames.ndim == 2:
+        frames = frames[None]
+    if frames.ndim != 3 or frames.shape[1:] != (NUM_LANDMARKS, 4):
+        raise ValueError(f"Landmarks must have shape ({NUM_LANDMARKS}, 4) or (N, {NUM_LANDMARKS}, 4)")
+    return frames
+
+def overloaded_response():
+    return web.json_response({"error": "Too many frames in flight, retry shortly"}, status=503,
+                             headers={"Retry-After": "1"})
+
+async def health(request):
+    service = request.app["service"]
+    return web.json_response({
+        "status": "ok",
+        "workers": service.workers,
+        "pending": service.pending,
+        "batches": service.batches,
+        "batched_frames": service.batched_frames,
+    })
+
+async def list_moves(request):
+    return web.json_response({
+        "dances": DANCES,
+        "moves": {name: move["label"] for name, move in MOVES.items()},
+    })
+
+async def score_landmarks(request):
+    session = ClientSession(request.app["service"], parse_moves(request.query))
+    try:
+        frames = parse_landmarks(await request.json())
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    return web.json_response({"frames": await session.score(frames)})
+
+async def score_frame(request):
+    service = request.app["service"]
+    session = ClientSession(service, parse_moves(request.query))
+    try:
+        landmarks = await service.infer(await request.read())
+    except Overloaded:
+        return overloaded_response()
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    return web.json_response({"frames": await session.score(landmarks[None], include_landmarks=True)})
+
+async def score_socket(request):
+    service = request.app["service"]
+    session = ClientSession(service, parse_moves(request.query))
+    socket = web.WebSocketResponse(heartbeat=request.app["heartbeat"])
+    await socket.prepare(request)
+    async for message in socket:
+        try:
+            if message.type == WSMsgType.BINARY:
+                frames = (await service.infer(message.data))[None]
+                reply = {"frames": await session.score(frames, include_landmarks=True)}
+            elif message.type == WSMsgType.TEXT:
+                reply = {"frames": await session.score(parse_landmarks(json.loads(message.data)))}
+            else:
+                continue
+        except Overloaded:
+            reply = {"error": "Too many frames in flight, frame dropped"}
+        except ValueError as e:
+            # Includes malformed JSON
+            reply = {"error": str(e)}
+        await socket.send_json(reply)
+    return socket
+
+def make_app(service, heartbeat=30.0, max_body=8 << 20):
+    if web is None:
+        raise SystemExit("The scoring service needs aiohttp installed.")
+    app = web.Application(client_max_size=max_body)
+    app["service"] = service
+    app["heartbeat"] = heartbeat
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.router.add_get("/health", health)
+    app.router.add_get("/moves", list_moves)
+    app.router.add_post("/score/landmarks", score_landmarks)
+    app.router.add_post("/score/frame", score_frame)
+    app.router.add_get("/ws", score_socket)
+    return app
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless HTTP/WebSocket dance scoring service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2, help="Pose worker threads")
+    parser.add_argument("--tier", choices=tuple(TIERS), default="full", help="Pose model tier")
+    parser.add_argument("--max-batch", type=int, default=256, help="Frames scored per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="How long a frame waits for a batch")
+    parser.add_argument("--max-pending", type=int, default=32,
+                        help="Images in flight before new ones are refused with 503")
+    parser.add_argument("--keepalive", type=float, default=75.0, help="Idle keep-alive timeout (s)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = ScoringService(args.workers, args.tier, args.max_batch, args.max_wait_ms / 1000, args.max_pending)
+    app = make_app(service)
+    web.run_app(app, host=args.host, port=args.port, keepalive_timeout=args.keepalive)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import threading
+import time
+
+class DanceSession:
+    # One run of the capture loop and everything it holds open. Resources are
+    # registered as they are acquired and closed in reverse order exactly once
+    # when the session leaves its `with` block: the source ended, the user
+    # stopped it, it went idle, or Streamlit interrupted the script run (a
+    # click on another button or a closed tab raises into the script thread at
+    # its next st.* call).
+    def __init__(self, idle_timeout=None):
+        # Seconds without a pose or motion before the session stops itself;
+        # None or 0 never times out
+        self.idle_timeout = idle_timeout
+        self.stop_event = threading.Event()
+        self.reason = None
+        self.lock = threading.Lock()
+        self.closers = []
+        self.closed = False
+        self.started_at = time.perf_counter()
+        self.last_active = self.started_at
+
+    def add(self, resource, close=None):
+        # Register resource.release() (or close) for cleanup; returns resource
+        if close is None:
+            close = getattr(resource, "release", None) or resource.close
+        with self.lock:
+            self.closers.append(close)
+        return resource
+
+    def stop(self, reason="Stopped"):
+        # Safe from any thread; the loop exits before its next frame
+        with self.lock:
+            if self.reason is None:
+                self.reason = reason
+        self.stop_event.set()
+
+    @property
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def touch(self, now=None):
+        # Something happened in front of the camera
+        self.last_active = time.perf_counter() if now is None else now
+
+    def check_idle(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.idle_timeout and now - self.last_active > self.idle_timeout:
+            self.stop(f"Stopped after {self.idle_timeout:.0f} s without a dancer")
+        return self.stopped
+
+    def frames(self, pipeline):
+        # pipeline.frames() until the session stops. Heartbeats (None, None)
+        # are passed on when no frame is ready, so the caller keeps reaching
+        # a Streamlit call (where an interrupted run is stopped) even while
+        # the source stalls.
+        for frame, result in pipeline.frames(heartbeat=True):
+            if self.check_idle():
+                break
+            yield frame, result
+            if self.stopped:
+                break
+
+    def close(self):
+        # Release everything, newest first; one failure does not stop the rest
+        with self.lock:
+            if self.closed:
+                return []
+            self.closed = True
+            closers, self.closers = self.closers[::-1], []
+        self.stop_event.set()
+        errors = []
+        for close in closers:
+            try:
+                close()
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SessionController:
+    # Per-browser-session handle (kept in st.session_state) on the running
+    # DanceSession, so widget callbacks such as the Stop button can cancel it
+    # and the next script run can show why it ended
+    def __init__(self):
+        self.session = None
+        self.last_reason = None
+
+    def start(self, idle_timeout=None):
+        # Never leave an earlier session holding the camera
+        self.stop("Replaced by a new session")
+        if self.session is not None:
+            self.session.close()
+        self.session = DanceSession(idle_timeout)
+        self.last_reason = None
+        return self.session
+
+    def stop(self, reason="Stopped"):
+        # A session the script run already closed keeps its first reason
+        if self.session is not None:
+            self.session.stop(reason)
+            self.last_reason = self.session.reason
+
+    def finish(self):
+        # Called when the loop has exited; returns why it ended
+        session = self.session
+        if session is None:
+            return None
+        session.close()
+        self.last_reason = session.reason
+        return session.reason
+
+    @property
+    def running(self):
+        return self.session is not None and not self.session.closed
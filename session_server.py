@@ -0,0 +1,230 @@
+import argparse
+import os
+import threading
+import time
+
+from engine import DanceEngine
+from moves import DANCES, MOVES, moves_for_dances
+from pipeline import PipelineStats
+from pose_provider import TIERS, provider
+from roi import RoiTracker
+from scheduler import MODES, InferenceScheduler
+from smoothing import SMOOTHERS, make_smoother
+from sources import open_capture
+
+class StreamState:
+    # Everything owned by one camera/dancer: its capture, its engine (Pose,
+    # motion detector, scheduler, history and scores) and its stats. A live
+    # stream only keeps its newest captured frame; a file or stills source
+    # waits until the workers took the pending one. At most one frame is in
+    # flight.
+    def __init__(self, stream_id, cap, engine, on_result=None):
+        self.stream_id = stream_id
+        self.cap = cap
+        self.live = getattr(cap, "live", True)
+        self.engine = engine
+        self.on_result = on_result
+        self.stats = PipelineStats()
+        self.pending = None
+        self.busy = False
+        self.stale = 0
+        self.active = True
+        self.error = None
+        self.last_result = None
+        self.thread = None
+
+class SessionManager:
+    def __init__(self, workers=None, max_latency=0.25, tier="full", inference_mode="always", crop_size=None,
+                 smoothing="off"):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_latency = max_latency
+        self.tier = tier
+        self.inference_mode = inference_mode
+        # Max side of the per-stream pose crop; None runs pose on the full frame
+        self.crop_size = crop_size
+        self.smoothing = smoothing
+        self.streams = {}
+        self.order = []
+        self.cursor = 0
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.worker_threads = []
+
+    def add_stream(self, stream_id, cap, move_names, on_result=None):
+        engine = DanceEngine(
+            move_names,
+            pose=provider.acquire(self.tier),
+            scheduler=InferenceScheduler(self.inference_mode),
+            roi_tracker=RoiTracker(max_side=self.crop_size) if self.crop_size else None,
+            smoother=make_smoother(self.smoothing),
+        )
+        stream = StreamState(stream_id, cap, engine, on_result)
+        with self.condition:
+            self.streams[stream_id] = stream
+            self.order.append(stream_id)
+        stream.thread = threading.Thread(
+            target=self._capture_loop, args=(stream,), name=f"capture-{stream_id}", daemon=True
+        )
+        stream.thread.start()
+        return stream
+
+    def remove_stream(self, stream_id):
+        with self.condition:
+            stream = self.streams.pop(stream_id, None)
+            if stream is None:
+                return
+            self.order.remove(stream_id)
+            stream.active = False
+            stream.pending = None
+            # Let a worker finish the frame in flight before releasing its Pose
+            while stream.busy:
+                self.condition.wait(timeout=0.1)
+        stream.thread.join(timeout=2.0)
+        stream.cap.release()
+        provider.release(stream.engine.pose)
+
+    def start(self):
+        self.worker_threads = [
+            threading.Thread(target=self._worker_loop, name=f"pose-worker-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self.worker_threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.worker_threads:
+            thread.join(timeout=2.0)
+        for stream_id in list(self.streams):
+            self.remove_stream(stream_id)
+
+    def snapshot(self):
+        return {
+            stream_id: dict(stream.stats.snapshot(), stale=stream.stale, error=stream.error)
+            for stream_id, stream in list(self.streams.items())
+        }
+
+    def _capture_loop(self, stream):
+        while stream.active and not self.stop_event.is_set():
+            if not stream.live:
+                with self.condition:
+                    while stream.pending is not None and stream.active and not self.stop_event.is_set():
+                        self.condition.wait(timeout=0.1)
+            started = time.perf_counter()
+            ret, frame = stream.cap.read()
+            if not ret:
+                stream.error = getattr(stream.cap, "error", "Failed to capture video.")
+                stream.active = False
+                break
+            stream.stats.record("capture", time.perf_counter() - started)
+            with self.condition:
+                # Backpressure: a frame the workers have not taken yet is replaced
+                if stream.pending is not None:
+                    stream.stats.drop()
+                stream.pending = (started, frame)
+                self.condition.notify()
+
+    def _next_job(self):
+        # Round-robin over streams with a waiting frame and nothing in flight,
+        # so a fast camera cannot starve the others. Called with the lock held.
+        count = len(self.order)
+        for offset in range(count):
+            stream = self.streams[self.order[(self.cursor + offset) % count]]
+            if stream.pending is None or stream.busy or not stream.active:
+                continue
+            self.cursor = (self.cursor + offset + 1) % count
+            captured_at, frame = stream.pending
+            stream.pending = None
+            if not stream.live:
+                # Its capture thread is waiting for the slot
+                self.condition.notify_all()
+            elif time.perf_counter() - captured_at > self.max_latency:
+                # Too old to be worth scoring; wait for a fresher frame
+                stream.stale += 1
+                continue
+            stream.busy = True
+            return stream, captured_at, frame
+        return None
+
+    def _worker_loop(self):
+        while not self.stop_event.is_set():
+            with self.condition:
+                job = self._next_job()
+                while job is None and not self.stop_event.is_set():
+                    self.condition.wait(timeout=0.1)
+                    job = self._next_job()
+            if job is None:
+                break
+            stream, captured_at, frame = job
+            try:
+                self._process(stream, captured_at, frame)
+            except Exception as e:
+                # A failing stream stops; the worker goes on serving the others
+                stream.error = f"Processing failed: {e}"
+                stream.active = False
+            finally:
+                with self.condition:
+                    stream.busy = False
+                    if not stream.active:
+                        stream.pending = None
+                    self.condition.notify()
+
+    def _process(self, stream, captured_at, frame):
+        engine = stream.engine
+        started = time.perf_counter()
+        result = engine.process_frame(frame)
+        stream.stats.record("inference", time.perf_counter() - started)
+        if result.landmarks is not None:
+            engine.score_array(result.landmarks)
+        stream.last_result = result
+        if stream.on_result is not None:
+            stream.on_result(stream.stream_id, result, dict(engine.scores), dict(engine.feedback))
+        stream.stats.frame_done(captured_at)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score several camera streams with a shared pose worker pool.")
+    parser.add_argument("--source", action="append", required=True,
+                        help="Camera index, video file, image folder or stream URL (repeatable)")
+    parser.add_argument("--dance", action="append", choices=sorted(DANCES),
+                        help="Dance to score (repeatable, default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="Pose worker threads (default: all cores)")
+    parser.add_argument("--max-latency", type=float, default=0.25,
+                        help="Drop live frames older than this many seconds")
+    parser.add_argument("--inference-mode", choices=MODES, default="always")
+    parser.add_argument("--tier", choices=tuple(TIERS), default="full", help="Pose model tier")
+    parser.add_argument("--crop-size", type=int, default=640,
+                        help="Run pose on a crop around the dancer scaled to this many pixels (0 = full frame)")
+    parser.add_argument("--smoothing", choices=SMOOTHERS, default="one_euro", help="Landmark filter")
+    parser.add_argument("--report-every", type=float, default=2.0)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    move_names = moves_for_dances(args.dance) if args.dance else list(MOVES)
+    manager = SessionManager(
+        args.workers, args.max_latency, tier=args.tier, inference_mode=args.inference_mode,
+        crop_size=args.crop_size, smoothing=args.smoothing,
+    ).start()
+    try:
+        for index, source in enumerate(args.source):
+            manager.add_stream(f"stream-{index}", open_capture(source), move_names)
+    except OSError as e:
+        manager.stop()
+        raise SystemExit(str(e))
+    try:
+        while any(stream.active for stream in manager.streams.values()):
+            time.sleep(args.report_every)
+            for stream_id, snap in manager.snapshot().items():
+                latency = snap["latency_ms"]["end_to_end"]
+                print(f"{stream_id}: {snap['fps']:.1f} fps, {latency:.0f} ms, "
+                      f"dropped {snap['dropped']}, stale {snap['stale']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+
+if __name__ == "__main__":
+    main()
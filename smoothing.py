@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, VISIBILITY
+
+# off: scorers see the raw landmarks
+# ema: exponential smoothing with a fixed weight
+# one_euro: One-Euro filter, smooth when still and responsive when moving
+SMOOTHERS = ("off", "ema", "one_euro")
+
+def smoothing_alpha(cutoff, dt):
+    # Weight of a new sample in a first-order low-pass at this cutoff (Hz)
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+class ExponentialFilter:
+    # Exponential smoothing of a whole (33, 4) landmark array per call. Joints
+    # below min_visibility do not update their position (they hold the last
+    # reliable one); visibility itself is smoothed so a one-frame dip does not
+    # flip confidence-gated rules. A gap longer than max_gap restarts the filter.
+    def __init__(self, alpha=0.5, min_visibility=0.5, max_gap=0.5):
+        self.alpha = alpha
+        self.min_visibility = min_visibility
+        self.max_gap = max_gap
+        self.state = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        self.last_time = None
+
+    def reset(self):
+        self.last_time = None
+
+    def _restart(self, landmarks, timestamp):
+        self.state[:] = landmarks
+        self.last_time = timestamp
+        return self.state.copy()
+
+    def _gate(self, landmarks):
+        return (landmarks[:, VISIBILITY] >= self.min_visibility)[:, None]
+
+    def __call__(self, landmarks, timestamp):
+        if landmarks is None:
+            return None
+        if self.last_time is None or timestamp - self.last_time > self.max_gap:
+            return self._restart(landmarks, timestamp)
+        self.last_time = timestamp
+        coords = self.state[:, :VISIBILITY]
+        coords += self._gate(landmarks) * self.alpha * (landmarks[:, :VISIBILITY] - coords)
+        self.state[:, VISIBILITY] += self.alpha * (landmarks[:, VISIBILITY] - self.state[:, VISIBILITY])
+        return self.state.copy()
+
+class OneEuroFilter(ExponentialFilter):
+    # One-Euro filter (Casiez et al.) vectorized over every landmark coordinate:
+    # the cutoff rises with each coordinate's filtered speed, so jitter on a
+    # still joint is removed while fast moves are followed with little lag.
+    # Coordinates are normalized, so speeds are in frame widths per second.
+    def __init__(self, min_cutoff=0.5, beta=10.0, d_cutoff=1.0, min_visibility=0.5, max_gap=0.5):
+        super().__init__(min_visibility=min_visibility, max_gap=max_gap)
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.derivative = np.zeros((NUM_LANDMARKS, VISIBILITY), dtype=np.float32)
+
+    def _restart(self, landmarks, timestamp):
+        self.derivative[:] = 0
+        return super()._restart(landmarks, timestamp)
+
+    def __call__(self, landmarks, timestamp):
+        if landmarks is None:
+            return None
+        if self.last_time is None or timestamp - self.last_time > self.max_gap:
+            return self._restart(landmarks, timestamp)
+        dt = max(timestamp - self.last_time, 1e-3)
+        self.last_time = timestamp
+        gate = self._gate(landmarks)
+        coords = self.state[:, :VISIBILITY]
+        change = landmarks[:, :VISIBILITY] - coords
+        self.derivative += gate * smoothing_alpha(self.d_cutoff, dt) * (change / dt - self.derivative)
+        # Per-coordinate cutoff, then the same low-pass weight formula vectorized
+        cutoff = self.min_cutoff + self.beta * np.abs(self.derivative)
+        alpha = 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * dt))
+        coords += gate * alpha * change
+        self.state[:, VISIBILITY] += smoothing_alpha(self.min_cutoff, dt) * (
+            landmarks[:, VISIBILITY] - self.state[:, VISIBILITY]
+        )
+        return self.state.copy()
+
+def make_smoother(kind="one_euro", **options):
+    if kind not in SMOOTHERS:
+        raise ValueError(f"Unknown smoothing {kind!r}, expected one of {SMOOTHERS}")
+    if kind == "ema":
+        return ExponentialFilter(**options)
+    if kind == "one_euro":
+        return OneEuroFilter(**options)
+    return None
+
+def smooth_sequence(smoother, landmarks, fps):
+    # Filter an (N, 33, 4) recording in frame order; NaN frames (no pose) stay
+    # NaN and count as gaps
+    smoothed = landmarks.copy()
+    dt = 1.0 / fps if fps else 1.0 / 30
+    smoother.reset()
+    for index, frame in enumerate(landmarks):
+        if not np.isnan(frame[0, 0]):
+            smoothed[index] = smoother(frame, index * dt)
+    return smoothed
@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+NETWORK_SCHEMES = ("rtsp://", "rtmp://", "http://", "https://", "tcp://", "udp://")
+
+class FrameSource:
+    # Async source of BGR frames. A background task decodes up to `prefetch`
+    # frames ahead into a bounded queue; live sources drop the oldest queued
+    # frame instead of waiting, so the consumer always gets a recent one.
+    # read() returns None once the source is exhausted.
+    def __init__(self, prefetch=4, live=False):
+        self.prefetch = prefetch
+        self.live = live
+        self.fps = None
+        self.queue = None
+        self.task = None
+        self.finished = False
+        self.error = None
+        self.frames_read = 0
+        self.dropped = 0
+
+    async def _open(self):
+        pass
+
+    async def _read(self):
+        raise NotImplementedError
+
+    async def _close(self):
+        pass
+
+    async def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.prefetch)
+            await self._open()
+            self.task = asyncio.create_task(self._fill())
+        return self
+
+    async def _fill(self):
+        try:
+            while True:
+                frame = await self._read()
+                if frame is None:
+                    break
+                if self.live and self.queue.full():
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                await self.queue.put(frame)
+        except Exception as e:
+            self.error = str(e)
+        await self.queue.put(None)
+
+    async def read(self):
+        if self.finished:
+            return None
+        await self.start()
+        frame = await self.queue.get()
+        if frame is None:
+            self.finished = True
+        else:
+            self.frames_read += 1
+        return frame
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            # Wake a reader waiting on the empty queue (e.g. a BlockingSource
+            # read from another thread) with the end-of-source marker
+            if self.queue.empty():
+                self.queue.put_nowait(None)
+        await self._close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self.read()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+class CaptureSource(FrameSource):
+    # Webcam index, video file or network stream through cv2.VideoCapture. The
+    # blocking open/read calls run in worker threads. A source that cannot be
+    # opened at all raises OSError right away; live sources (cameras and
+    # streams) that were open reconnect after a failed read, waiting backoff
+    # seconds and doubling the wait up to max_backoff; max_retries=None
+    # retries forever.
+    def __init__(self, target, prefetch=4, live=None, reconnect=None, backoff=0.5, max_backoff=8.0,
+                 max_retries=None):
+        is_live = isinstance(target, int) or str(target).startswith(NETWORK_SCHEMES)
+        super().__init__(prefetch, is_live if live is None else live)
+        self.target = target
+        self.reconnect = is_live if reconnect is None else reconnect
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.cap = None
+        self.reconnects = 0
+
+    async def _connect(self):
+        cap = await asyncio.to_thread(cv2.VideoCapture, self.target)
+        if not cap.isOpened():
+            cap.release()
+            return False
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or None
+        return True
+
+    async def _reconnect(self):
+        delay = self.backoff
+        attempts = 0
+        while self.max_retries is None or attempts < self.max_retries:
+            attempts += 1
+            await asyncio.sleep(delay)
+            if await self._connect():
+                self.reconnects += 1
+                return
+            delay = min(delay * 2, self.max_backoff)
+        raise OSError(f"Video source {self.target!r} did not come back after {attempts} retries")
+
+    async def _open(self):
+        # No reconnecting here: a missing camera or a wrong URL would otherwise
+        # keep open_capture() waiting forever
+        if not await self._connect():
+            raise OSError(f"Could not open video source {self.target!r}")
+
+    async def _read(self):
+        while True:
+            ok, frame = await asyncio.to_thread(self.cap.read)
+            if ok:
+                return frame
+            if not self.reconnect:
+                return None
+            await asyncio.to_thread(self.cap.release)
+            await self._reconnect()
+
+    async def _close(self):
+        if self.cap is not None:
+            await asyncio.to_thread(self.cap.release)
+
+class ImageDirectorySource(FrameSource):
+    # Still images from a folder (or a single image such as first.jpg) in name
+    # order, paced at fps when given; repeat=True cycles forever, which makes
+    # a few stills stand in for a camera.
+    def __init__(self, path, fps=None, repeat=False, prefetch=4):
+        super().__init__(prefetch, live=False)
+        if os.path.isdir(path):
+            self.paths = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        else:
+            self.paths = [path]
+        if not self.paths:
+            raise OSError(f"No images in {path!r}")
+        self.fps = fps
+        self.repeat = repeat
+        self.index = 0
+        self.next_due = None
+
+    async def _read(self):
+        if self.index >= len(self.paths):
+            if not self.repeat:
+                return None
+            self.index = 0
+        if self.fps:
+            now = time.perf_counter()
+            if self.next_due is not None and now < self.next_due:
+                await asyncio.sleep(self.next_due - now)
+            self.next_due = max(now, self.next_due or now) + 1.0 / self.fps
+        frame = await asyncio.to_thread(cv2.imread, self.paths[self.index])
+        self.index += 1
+        if frame is None:
+            raise OSError(f"Could not read image {self.paths[self.index - 1]!r}")
+        return frame
+
+def open_source(spec, **options):
+    # "0" -> webcam 0, a folder or image file -> stills, a URL -> network
+    # stream, anything else -> video file
+    spec = str(spec)
+    if spec.isdigit():
+        return CaptureSource(int(spec), **options)
+    if os.path.isdir(spec) or spec.lower().endswith(IMAGE_EXTENSIONS):
+        return ImageDirectorySource(spec, **options)
+    return CaptureSource(spec, **options)
+
+# One event loop thread runs every BlockingSource, so many sources share it
+background_loop = None
+background_lock = threading.Lock()
+
+def get_background_loop():
+    global background_loop
+    with background_lock:
+        if background_loop is None:
+            background_loop = asyncio.new_event_loop()
+            threading.Thread(target=background_loop.run_forever, name="frame-sources", daemon=True).start()
+        return background_loop
+
+class BlockingSource:
+    # cv2.VideoCapture-style read()/get()/release() over an async source, for
+    # the threaded FramePipeline and SessionManager
+    def __init__(self, source):
+        self.source = source
+        self.loop = get_background_loop()
+        self._run(source.start())
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    @property
+    def error(self):
+        return self.source.error
+
+    @property
+    def live(self):
+        return self.source.live
+
+    def isOpened(self):
+        return not self.source.finished
+
+    def read(self):
+        frame = self._run(self.source.read())
+        return frame is not None, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.source.fps or 0.0
+        return 0.0
+
+    def release(self):
+        self._run(self.source.close())
+
+def open_capture(spec, **options):
+    return BlockingSource(open_source(spec, **options))
+
+async def stream_mjpeg(reader, writer, spec, fps, quality):
+    # One client of the MJPEG stand-in: its own source, frames as JPEG parts
+    await reader.readuntil(b"\r\n\r\n")
+    writer.write(
+        b"HTTP/1.0 200 OK\r\n"
+        b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n\r\n"
+    )
+    source = open_source(spec)
+    if isinstance(source, ImageDirectorySource):
+        source.repeat = True
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    next_due = time.perf_counter()
+    try:
+        async for frame in source:
+            # Pace like a camera
+            next_due += 1.0 / fps
+            await asyncio.sleep(max(0.0, next_due - time.perf_counter()))
+            ok, encoded = cv2.imencode(".jpg", frame, params)
+            if not ok:
+                continue
+            data = encoded.tobytes()
+            writer.write(
+                b"--frame\r\nContent-Type: image/jpeg\r\n"
+                + f"Content-Length: {len(data)}\r\n\r\n".encode() + data + b"\r\n"
+            )
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        await source.close()
+        writer.close()
+
+async def serve_mjpeg(spec, host="127.0.0.1", port=8090, fps=15.0, quality=80):
+    # Local network stream stand-in: http://host:port/ serves the source as
+    # MJPEG, which cv2.VideoCapture (and so CaptureSource) can open
+    server = await asyncio.start_server(
+        lambda reader, writer: stream_mjpeg(reader, writer, spec, fps, quality), host, port
+    )
+    async with server:
+        await server.serve_forever()
+
+async def probe(specs, frames):
+    # Read from several sources concurrently in one event loop
+    async def read_some(spec):
+        started = time.perf_counter()
+        async with open_source(spec) as source:
+            count = 0
+            while count < frames and await source.read() is not None:
+                count += 1
+            elapsed = time.perf_counter() - started
+            print(f"{spec}: {count} frames in {elapsed:.2f} s ({count / elapsed:.1f} fps), "
+                  f"dropped {source.dropped}, error {source.error}")
+    await asyncio.gather(*(read_some(spec) for spec in specs))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Frame source tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Serve a source as a local MJPEG stream")
+    serve.add_argument("source")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8090)
+    serve.add_argument("--fps", type=float, default=15.0)
+    probe_parser = commands.add_parser("probe", help="Read from sources concurrently and report rates")
+    probe_parser.add_argument("source", nargs="+")
+    probe_parser.add_argument("--frames", type=int, default=100)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.command == "serve":
+            print(f"Serving {args.source} on http://{args.host}:{args.port}/")
+            asyncio.run(serve_mjpeg(args.source, args.host, args.port, args.fps))
+        else:
+            asyncio.run(probe(args.source, args.frames))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Cold-start bookkeeping for the Streamlit apps. Streamlit re-executes the
+# app script on every widget interaction, but modules and this process-wide
+# state survive reruns, so heavy imports and model builds happen once per
+# server process, in background threads, while the first page renders.
+
+# Imported only when a session starts (or by the preloader), in this order
+HEAVY_MODULES = (
+    "cv2",
+    "mediapipe",
+    "engine",
+    "pipeline",
+    "frame_ring",
+    "preview",
+    "recorder",
+    "report",
+    "roi",
+    "sources",
+    "choreography",
+)
+
+# perf_counter() when this module was first imported: for the apps, the start
+# of the first script run, before any heavy module is loaded
+process_started = time.perf_counter()
+
+class StartupReport:
+    # Seconds per import ("import cv2") and per model build ("model full")
+    # in the order they finished, plus the first page render
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.timings.setdefault(name, seconds)
+
+    @contextmanager
+    def time(self, name):
+        # Only completed steps are recorded, not ones that raised
+        started = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.timings)
+
+    def render(self):
+        lines = ["Startup (s):"]
+        for name, seconds in self.snapshot().items():
+            lines.append(f"  {name}: {seconds:.3f}")
+        return "\n".join(lines)
+
+report = StartupReport()
+
+def timed_import(name):
+    # import_module that records how long a first import took. Modules
+    # already loaded (e.g. pulled in by an earlier import) are not recorded.
+    # import_module is still called for them: a module another thread is
+    # importing sits half-initialized in sys.modules, and import_module waits
+    # for it to finish.
+    if name in sys.modules:
+        return importlib.import_module(name)
+    with report.time(f"import {name}"):
+        return importlib.import_module(name)
+
+class BackgroundTask:
+    # Runs fn once in a daemon thread; result() waits for it and re-raises
+    # its exception
+    def __init__(self, name, fn):
+        self.name = name
+        self.value = None
+        self.error = None
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(fn,), name=f"startup-{name}", daemon=True)
+        self.thread.start()
+
+    def _run(self, fn):
+        try:
+            self.value = fn()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished.set()
+
+    def done(self):
+        return self.finished.is_set()
+
+    def result(self, timeout=None):
+        if not self.finished.wait(timeout):
+            raise TimeoutError(f"{self.name} is still loading")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+tasks = {}
+tasks_lock = threading.Lock()
+
+def run_once(key, fn):
+    # One BackgroundTask per key for the life of the process, so reruns with
+    # the same settings reuse it instead of starting the work again
+    with tasks_lock:
+        task = tasks.get(key)
+        if task is None:
+            task = tasks[key] = BackgroundTask(str(key), fn)
+        return task
+
+def preload_modules(modules=HEAVY_MODULES):
+    def load():
+        for name in modules:
+            timed_import(name)
+    return run_once(("modules",) + tuple(modules), load)
+
+def record_first_render():
+    # Time from process start to the end of the first script run
+    report.record("first render", time.perf_counter() - process_started)
+
+def measure(modules, tier=None):
+    # Cold-start numbers for this interpreter: each module's own import time
+    # (in order, so shared dependencies count once) and optionally a model build
+    started = time.perf_counter()
+    for name in modules:
+        timed_import(name)
+    if tier is not None:
+        from pose_provider import provider
+        provider.prewarm(tier)
+    report.record("total", time.perf_counter() - started)
+    return report.snapshot()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import and model load times.")
+    parser.add_argument("--modules", nargs="+", default=("streamlit",) + HEAVY_MODULES + ("dance_app",))
+    parser.add_argument("--tier", default="full", help="Pose tier to build and warm ('none' to skip)")
+    parser.add_argument("--runs", type=int, default=1, help="Fresh interpreters to measure")
+    parser.add_argument("--json", default=None, help="Append each run's timings to this JSON lines file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    tier = None if args.tier == "none" else args.tier
+    if args.child:
+        # Run as a script this file is __main__; measure through the importable
+        # startup module, whose report pose_provider writes to
+        import startup
+        print(json.dumps(startup.measure(args.modules, tier)))
+        return
+    # Every run is a new interpreter, so nothing is cached from the last one
+    command = [sys.executable, __file__, "--child", "--tier", args.tier, "--modules", *args.modules]
+    for run in range(args.runs):
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        print(f"Run {run + 1}:")
+        for name, seconds in timings.items():
+            print(f"  {name}: {seconds:.3f} s")
+        if args.json:
+            with open(args.json, "a") as f:
+                f.write(json.dumps(dict(timings, created=time.time())) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import numpy as np
+
+from landmarks import LEFT_WRIST, NUM_LANDMARKS, Y
+from rules import RulePlan
+
+def test_mean_skips_only_windows_with_a_missing_frame():
+    # A frame without a pose (all NaN) must only miss the windows it falls in
+    plan = RulePlan({"raised": {"when": [{"lhs": {"mean": "LEFT_WRIST.y", "frames": 3}, "op": "<", "rhs": 0.5}]}})
+    frames = np.zeros((20, NUM_LANDMARKS, 4), dtype=np.float32)
+    frames[:, LEFT_WRIST, Y] = 0.2
+    frames[5] = np.nan
+    codes = plan.evaluate(frames)["raised"]
+    expected = np.ones(20, dtype=np.int8)
+    expected[:2] = 0
+    expected[5:8] = 0
+    np.testing.assert_array_equal(codes, expected)